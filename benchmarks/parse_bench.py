@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+from bot.schemas import QueryResult
+from bot.services.prom_utils import (
+    extract_listing_entry,
+    find_apollo_state,
+    load_apollo_state,
+    normalize_price_value,
+    normalize_product,
+)
+from bot.utils.text import render_excel
+
+# Снимок главной страницы Prom.ua: в нём нет листинга, поэтому синтетический
+# листинг вставляется в его настоящий _FAST_CACHE рядом с остальными ~160 KB.
+DEFAULT_SNAPSHOT = Path(__file__).resolve().parent.parent / "Prom – найбільший маркетплейс України.html"
+BASE_ROOT = "https://prom.ua"
+PRODUCTS_PER_UNIT = 30
+LISTING_KEY = 'SearchProductsListingQuery{"search_term":"benchmark"}'
+PRICE_SAMPLES = ("1 299", "1\xa0299,50 ₴", "12.345,6", "від 99 грн", "0,99", "")
+
+
+def build_raw_product(index: int) -> Dict[str, Any]:
+    presence = (
+        {"catalogPresence": {"title": "В наявності"}}
+        if index % 3
+        else {"presence": {"presence": "avail"}}
+    )
+    return {
+        **presence,
+        "companyId": 1000 + index % 7,
+        "product": {
+            "id": 100000 + index,
+            "name": f"Товар для бенчмарку №{index} з довгою назвою",
+            "price": PRICE_SAMPLES[index % (len(PRICE_SAMPLES) - 1)],
+            "discountedPrice": None,
+            "urlForProductCatalog": f"/p{100000 + index}-tovar-{index}.html",
+            "manufacturerInfo": {"name": "Brand"} if index % 2 else None,
+            "ordersCount": index % 50,
+        },
+    }
+
+
+def build_listing_html(snapshot: str, scale: int) -> str:
+    blob = find_apollo_state(snapshot)
+    if blob is None:
+        raise ValueError("В снимке нет window.ApolloCacheState")
+    state = load_apollo_state(blob)
+    products = [build_raw_product(idx) for idx in range(PRODUCTS_PER_UNIT * scale)]
+    companies = [{"id": 1000 + idx, "name": f"Магазин {idx}"} for idx in range(7)]
+    state.setdefault("_FAST_CACHE", {})[LISTING_KEY] = {
+        "result": {
+            "listing": {
+                "page": {
+                    "products": products,
+                    "total": len(products) * 10,
+                    "companies": companies,
+                }
+            }
+        },
+        "variables": {"limit": len(products)},
+    }
+    marker = f"window.ApolloCacheState = {blob};"
+    replacement = f"window.ApolloCacheState = {json.dumps(state, ensure_ascii=False)};"
+    return snapshot.replace(marker, replacement, 1)
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    func()
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    p95_index = min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[p95_index] * 1000,
+        "peak_kb": peak / 1024,
+    }
+
+
+def run_scale(snapshot: str, scale: int, repeat: int) -> Dict[str, Any]:
+    html = build_listing_html(snapshot, scale)
+    entry = extract_listing_entry(html)
+    page = entry["result"]["listing"]["page"]
+    raw_products = page["products"]
+    company_lookup = {str(item["id"]): item["name"] for item in page["companies"]}
+    products = [
+        product
+        for product in (normalize_product(raw, BASE_ROOT, company_lookup) for raw in raw_products)
+        if product
+    ]
+    prices = [raw["product"]["price"] for raw in raw_products]
+    results = [QueryResult(query="benchmark", products=products)]
+
+    stages = {
+        "extract_listing_entry": measure(lambda: extract_listing_entry(html), repeat),
+        "normalize_product": measure(
+            lambda: [normalize_product(raw, BASE_ROOT, company_lookup) for raw in raw_products],
+            repeat,
+        ),
+        "normalize_price_value": measure(
+            lambda: [normalize_price_value(price) for price in prices], repeat
+        ),
+        "render_excel": measure(lambda: render_excel(results), repeat),
+    }
+    parse_ms = stages["extract_listing_entry"]["median_ms"] + stages["normalize_product"]["median_ms"]
+    return {
+        "scale": scale,
+        "html_kb": len(html.encode("utf-8")) / 1024,
+        "raw_products": len(raw_products),
+        "products": len(products),
+        "stages": stages,
+        "pages_per_sec": 1000 / parse_ms if parse_ms else 0.0,
+        "products_per_sec": len(raw_products) * 1000 / parse_ms if parse_ms else 0.0,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"\nМасштаб ×{report['scale']}: {report['html_kb']:.0f} KB HTML, "
+        f"{report['raw_products']} товаров в листинге, {report['products']} после фильтра"
+    )
+    print(f"  {'этап':<24}{'median, ms':>12}{'p95, ms':>12}{'peak, KB':>12}")
+    for name, stats in report["stages"].items():
+        print(
+            f"  {name:<24}{stats['median_ms']:>12.3f}{stats['p95_ms']:>12.3f}{stats['peak_kb']:>12.1f}"
+        )
+    print(
+        f"  разбор страницы: {report['pages_per_sec']:.1f} стр/с, "
+        f"{report['products_per_sec']:.0f} товаров/с"
+    )
+
+
+def parse_scales(raw: str) -> Sequence[int]:
+    scales = [int(item) for item in raw.split(",") if item.strip()]
+    if not scales or any(scale < 1 for scale in scales):
+        raise argparse.ArgumentTypeError("Масштабы должны быть положительными числами")
+    return scales
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Офлайн-бенчмарк разбора страниц Prom.ua и выгрузки в Excel"
+    )
+    parser.add_argument("--html", type=Path, default=DEFAULT_SNAPSHOT, help="Снимок страницы Prom.ua")
+    parser.add_argument(
+        "--scales",
+        type=parse_scales,
+        default=parse_scales("1,5,20"),
+        help=f"Множители размера листинга через запятую (×{PRODUCTS_PER_UNIT} товаров)",
+    )
+    parser.add_argument("--repeat", type=int, default=20, help="Число замеров на этап")
+    parser.add_argument("--json", dest="json_path", type=Path, help="Сохранить отчёт в JSON")
+    args = parser.parse_args()
+
+    snapshot = args.html.read_text(encoding="utf-8")
+    reports = [run_scale(snapshot, scale, max(1, args.repeat)) for scale in args.scales]
+    for report in reports:
+        print_report(report)
+    if args.json_path:
+        args.json_path.write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+from bot.schemas import Product, ProductRecord
+
+
+def build_rows(count: int) -> List[Dict[str, str]]:
+    return [
+        {
+            "url": f"https://prom.ua/p{100000 + idx}-tovar-{idx}.html",
+            "name": f"Товар для бенчмарку №{idx} з довгою назвою",
+            "price": f"{idx % 5000},50",
+            "presence": "В наявності",
+            "seller": f"Магазин {idx % 7}",
+            "manufacturer": "Brand" if idx % 2 else "",
+        }
+        for idx in range(count)
+    ]
+
+
+def time_per_item(func: Callable[[], Sequence[Any]], count: int, repeat: int) -> float:
+    func()
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best / count * 1e9
+
+
+def retained_bytes(func: Callable[[], Sequence[Any]], count: int) -> float:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        items = func()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del items
+    return (after - before) / count
+
+
+def run(count: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    # Строки создаются заранее, поэтому замер памяти учитывает только сами объекты и списки.
+    rows = build_rows(count)
+    cases: Dict[str, Callable[[], Sequence[Any]]] = {
+        "Product(**row)": lambda: [Product(**row) for row in rows],
+        "Product.model_construct": lambda: [Product.model_construct(**row) for row in rows],
+        "ProductRecord(**row)": lambda: [ProductRecord(**row) for row in rows],
+    }
+    return {
+        name: {
+            "ns_per_item": time_per_item(func, count, repeat),
+            "bytes_per_item": retained_bytes(func, count),
+        }
+        for name, func in cases.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Стоимость создания и память Product (pydantic) против ProductRecord"
+    )
+    parser.add_argument("--count", type=int, default=100_000, help="Сколько товаров создавать")
+    parser.add_argument("--repeat", type=int, default=5, help="Число замеров, берётся лучший")
+    parser.add_argument("--json", dest="json_path", type=Path, help="Сохранить отчёт в JSON")
+    args = parser.parse_args()
+
+    count = max(1, args.count)
+    report = run(count, max(1, args.repeat))
+    print(f"{count} товаров")
+    print(f"  {'способ':<26}{'нс/товар':>12}{'байт/товар':>14}")
+    for name, stats in report.items():
+        print(f"  {name:<26}{stats['ns_per_item']:>12.0f}{stats['bytes_per_item']:>14.0f}")
+    if args.json_path:
+        args.json_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import asyncio
+import importlib.util
 import logging
+from typing import List
 
 import httpx
 from aiogram import Bot, Dispatcher
@@ -10,11 +12,71 @@ from aiogram.types import BotCommand
 from .config import Config, load_config
 from .handlers import setup_router
 from .repository import Database
-from .services.prom_scraper import PromScraper
-
-
-async def _create_http_client() -> httpx.AsyncClient:
-    return httpx.AsyncClient(follow_redirects=True)
+from .services.executor import CpuExecutor
+from .services.jobs import FairJobQueue
+from .services.log_writer import SearchLogWriter
+from .services.product_cache import ProductCache
+from .services.prom_scraper import PromScraper, ThrottleSettings
+from .services.rate_limit import QuotaTracker
+from .services.scheduler import FairScheduler
+from .services.search_jobs import SearchJob, SearchJobRunner
+from .services.subscription import SubscriptionChecker
+from .services.users import UserRegistry
+from .utils import metrics
+from .webhook import InFlightTracker, run_webhook
+
+logger = logging.getLogger(__name__)
+
+
+# Кодировки, которые httpx умеет распаковывать, и модули, без которых они недоступны.
+_ENCODING_MODULES = {
+    "gzip": (),
+    "deflate": (),
+    "br": ("brotli", "brotlicffi"),
+    "zstd": ("zstandard",),
+}
+
+
+def _has_module(*names: str) -> bool:
+    return any(importlib.util.find_spec(name) is not None for name in names)
+
+
+def _accept_encoding(raw: str) -> str:
+    encodings: List[str] = []
+    for item in raw.split(","):
+        encoding = item.strip().lower()
+        if encoding not in _ENCODING_MODULES:
+            logger.warning("Unknown HTTP encoding %r ignored", encoding)
+            continue
+        modules = _ENCODING_MODULES[encoding]
+        if modules and not _has_module(*modules):
+            logger.warning("HTTP encoding %r disabled: install %s", encoding, modules[0])
+            continue
+        encodings.append(encoding)
+    return ", ".join(encodings) or "identity"
+
+
+async def _create_http_client(config: Config) -> httpx.AsyncClient:
+    http2 = config.http2
+    if http2 and not _has_module("h2"):
+        logger.warning("HTTP/2 disabled: install httpx[http2]")
+        http2 = False
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=config.http_max_connections,
+            max_keepalive_connections=config.http_max_keepalive_connections,
+            keepalive_expiry=config.http_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            connect=config.http_connect_timeout,
+            read=config.http_read_timeout,
+            write=config.http_write_timeout,
+            pool=config.http_pool_timeout,
+        ),
+        headers={"Accept-Encoding": _accept_encoding(config.http_accept_encoding)},
+    )
 
 
 async def _setup_bot_commands(bot: Bot) -> None:
@@ -33,22 +95,135 @@ async def main() -> None:
     bot = Bot(token=config.bot_token)
     dp = Dispatcher()
     dp.include_router(setup_router())
-
-    db = Database(config.postgres_dsn)
+    tracker = InFlightTracker()
+    dp.update.outer_middleware(tracker)
+
+    db = Database(
+        config.postgres_dsn,
+        min_size=config.db_pool_min_size,
+        max_size=config.db_pool_max_size,
+        max_inactive_connection_lifetime=config.db_pool_max_inactive_lifetime,
+        statement_cache_size=config.db_statement_cache_size,
+        command_timeout=config.db_command_timeout,
+    )
     await db.connect()
 
-    http_client = await _create_http_client()
-    scraper = PromScraper(http_client, base_url=config.prom_base_url)
+    log_writer = SearchLogWriter(
+        db,
+        max_buffer=config.log_buffer_size,
+        batch_size=config.log_flush_batch_size,
+        flush_interval=config.log_flush_interval,
+    )
+    log_writer.start()
+    quota = QuotaTracker(
+        db,
+        log_writer,
+        local=config.quota_backend == "memory",
+        queue_size=config.quota_flush_queue_size,
+        batch_size=config.quota_flush_batch_size,
+        flush_interval=config.quota_flush_interval,
+    )
+    quota.start()
+
+    executor = CpuExecutor(
+        kind=config.cpu_executor,
+        max_workers=config.cpu_executor_workers,
+        max_pending=config.cpu_executor_max_pending,
+    )
+    await executor.start()
+
+    http_client = await _create_http_client(config)
+    cache = ProductCache(
+        db,
+        ttl_seconds=config.cache_ttl_seconds,
+        memory_max_entries=config.memory_cache_max_entries,
+        stale_seconds=config.cache_stale_seconds,
+    )
+    scheduler = FairScheduler(config.scheduler_capacity)
+    scraper = PromScraper(
+        http_client,
+        base_url=config.prom_base_url,
+        cache=cache,
+        executor=executor,
+        host_concurrency=config.prom_host_concurrency,
+        throttle=ThrottleSettings(
+            rate=config.prom_rate,
+            min_rate=config.prom_min_rate,
+            max_rate=config.prom_max_rate,
+            retry_attempts=config.prom_retry_attempts,
+            backoff_base=config.prom_retry_backoff_base,
+            backoff_max=config.prom_retry_backoff_max,
+            breaker_failures=config.prom_breaker_failures,
+            breaker_reset=config.prom_breaker_reset,
+        ),
+        scheduler=scheduler,
+    )
+
+    runner = SearchJobRunner(
+        bot,
+        config,
+        quota,
+        scraper,
+        executor,
+        progress_interval=config.progress_interval,
+    )
+    jobs: FairJobQueue[SearchJob] = FairJobQueue(
+        runner, workers=config.search_workers, on_drop=runner.drop
+    )
+    jobs.start()
 
     dp["config"] = config
     dp["db"] = db
+    dp["quota"] = quota
     dp["scraper"] = scraper
+    dp["executor"] = executor
+    dp["jobs"] = jobs
+    dp["subscriptions"] = SubscriptionChecker(
+        ttl_seconds=config.subscription_cache_ttl,
+        negative_ttl_seconds=config.subscription_negative_ttl,
+        max_entries=config.subscription_cache_max_entries,
+    )
+    dp["users"] = UserRegistry(db, max_entries=config.user_cache_max_entries)
+
+    metrics.CPU_QUEUE_DEPTH.set_callback(lambda: executor.queue_depth)
+    metrics.DB_POOL_SIZE.set_callback(lambda: db.pool_stats.size)
+    metrics.DB_POOL_IDLE.set_callback(lambda: db.pool_stats.idle)
+    metrics.SEARCH_LOG_QUEUE_DEPTH.set_callback(lambda: log_writer.queue_depth)
+    metrics.QUOTA_QUEUE_DEPTH.set_callback(lambda: quota.queue_depth)
+    metrics.UPDATES_IN_FLIGHT.set_callback(lambda: tracker.in_flight)
+    metrics.SEARCH_JOBS_PENDING.set_callback(lambda: jobs.pending)
+    metrics.SEARCH_JOBS_RUNNING.set_callback(lambda: jobs.running)
+    metrics.SCHEDULER_WAITING.set_callback(lambda: scheduler.stats.waiting)
+    lag_monitor = metrics.LoopLagMonitor(config.loop_lag_interval)
+    lag_monitor.start()
+    metrics_runner = None
+    if config.metrics_port:
+        metrics_runner = await metrics.start_metrics_server(config.metrics_host, config.metrics_port)
 
     try:
         await _setup_bot_commands(bot)
-        await dp.start_polling(bot)
+        if config.run_mode == "webhook":
+            await run_webhook(bot, dp, config, db, tracker)
+        else:
+            await dp.start_polling(
+                bot, close_bot_session=False, tasks_concurrency_limit=config.update_workers
+            )
+            await tracker.drain(config.shutdown_timeout)
     finally:
+        # Сначала дорабатывают задачи поиска: им нужны бот, HTTP-клиент и база.
+        await jobs.close(config.shutdown_timeout)
+        # Сессию закрываем только здесь: ни polling, ни обработчик вебхука её не закрывают.
+        await bot.session.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await lag_monitor.close()
+        logger.info("Memory cache stats: %s", cache.memory_stats)
+        logger.info("Database pool stats: %s", db.pool_stats)
         await http_client.aclose()
+        await executor.shutdown()
+        # Дописываем накопленные логи и расход лимита до закрытия пула.
+        await quota.close()
+        await log_writer.close()
         await db.disconnect()
 
 
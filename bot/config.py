@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from typing import List, Sequence
+from typing import List, Literal, Sequence, Set
 
 from pydantic import Field, PrivateAttr
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -11,30 +11,121 @@ class Config(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
     bot_token: str = Field(..., env="BOT_TOKEN")
+    run_mode: Literal["polling", "webhook"] = Field(default="polling", env="RUN_MODE")
+    webhook_url: str = Field(default="", env="WEBHOOK_URL")
+    webhook_path: str = Field(default="/telegram/webhook", env="WEBHOOK_PATH")
+    webhook_secret: str = Field(default="", env="WEBHOOK_SECRET")
+    webhook_host: str = Field(default="0.0.0.0", env="WEBHOOK_HOST")
+    webhook_port: int = Field(default=8080, ge=1, le=65535, env="WEBHOOK_PORT")
+    webhook_max_connections: int = Field(
+        default=40, ge=1, le=100, env="WEBHOOK_MAX_CONNECTIONS"
+    )
+    webhook_drain_delay: float = Field(default=0.0, ge=0, env="WEBHOOK_DRAIN_DELAY")
+    update_workers: int = Field(default=32, ge=1, env="UPDATE_WORKERS")
+    shutdown_timeout: float = Field(default=30.0, ge=0, env="SHUTDOWN_TIMEOUT")
     postgres_dsn: str = Field(..., env="POSTGRES_DSN")
+    db_pool_min_size: int = Field(default=1, ge=0, env="DB_POOL_MIN_SIZE")
+    db_pool_max_size: int = Field(default=5, ge=1, env="DB_POOL_MAX_SIZE")
+    db_pool_max_inactive_lifetime: float = Field(
+        default=300.0, ge=0, env="DB_POOL_MAX_INACTIVE_LIFETIME"
+    )
+    db_statement_cache_size: int = Field(default=100, ge=0, env="DB_STATEMENT_CACHE_SIZE")
+    db_command_timeout: float = Field(default=30.0, ge=0, env="DB_COMMAND_TIMEOUT")
     required_channels_raw: str | None = Field(default=None, alias="REQUIRED_CHANNELS")
+    subscription_cache_ttl: float = Field(default=600.0, ge=0, env="SUBSCRIPTION_CACHE_TTL")
+    subscription_negative_ttl: float = Field(
+        default=30.0, ge=0, env="SUBSCRIPTION_NEGATIVE_TTL"
+    )
+    subscription_cache_max_entries: int = Field(
+        default=10000, ge=1, env="SUBSCRIPTION_CACHE_MAX_ENTRIES"
+    )
+    user_cache_max_entries: int = Field(default=100000, ge=1, env="USER_CACHE_MAX_ENTRIES")
     daily_query_limit: int = Field(default=10, ge=1, env="DAILY_QUERY_LIMIT")
     cache_ttl_seconds: int = Field(default=3600, ge=0, env="CACHE_TTL_SECONDS")
+    memory_cache_max_entries: int = Field(
+        default=1000, ge=0, env="MEMORY_CACHE_MAX_ENTRIES"
+    )
+    cache_stale_seconds: int = Field(default=21600, ge=0, env="CACHE_STALE_SECONDS")
+    quota_backend: Literal["memory", "db"] = Field(default="memory", env="QUOTA_BACKEND")
+    quota_flush_interval: float = Field(default=1.0, gt=0, env="QUOTA_FLUSH_INTERVAL")
+    quota_flush_batch_size: int = Field(default=500, ge=1, env="QUOTA_FLUSH_BATCH_SIZE")
+    quota_flush_queue_size: int = Field(default=10000, ge=1, env="QUOTA_FLUSH_QUEUE_SIZE")
+    log_flush_interval: float = Field(default=1.0, gt=0, env="LOG_FLUSH_INTERVAL")
+    log_flush_batch_size: int = Field(default=1000, ge=1, env="LOG_FLUSH_BATCH_SIZE")
+    log_buffer_size: int = Field(default=10000, ge=1, env="LOG_BUFFER_SIZE")
+    search_workers: int = Field(default=4, ge=1, env="SEARCH_WORKERS")
+    max_jobs_per_user: int = Field(default=2, ge=1, env="MAX_JOBS_PER_USER")
+    progress_interval: float = Field(default=2.0, gt=0, env="PROGRESS_INTERVAL")
+    scheduler_capacity: int = Field(default=8, ge=1, env="SCHEDULER_CAPACITY")
+    user_concurrency: int = Field(default=2, ge=1, env="USER_CONCURRENCY")
+    premium_user_concurrency: int = Field(default=4, ge=1, env="PREMIUM_USER_CONCURRENCY")
+    premium_weight: float = Field(default=4.0, ge=1, env="PREMIUM_WEIGHT")
+    search_concurrency: int = Field(default=5, ge=1, env="SEARCH_CONCURRENCY")
+    search_max_pages: int = Field(default=1, ge=1, env="SEARCH_MAX_PAGES")
+    premium_search_max_pages: int = Field(default=5, ge=1, env="PREMIUM_SEARCH_MAX_PAGES")
+    premium_user_ids_raw: str | None = Field(default=None, alias="PREMIUM_USER_IDS")
+    prom_host_concurrency: int = Field(default=8, ge=1, env="PROM_HOST_CONCURRENCY")
+    prom_rate: float = Field(default=5.0, gt=0, env="PROM_RATE")
+    prom_min_rate: float = Field(default=0.5, gt=0, env="PROM_MIN_RATE")
+    prom_max_rate: float = Field(default=20.0, gt=0, env="PROM_MAX_RATE")
+    prom_retry_attempts: int = Field(default=3, ge=1, env="PROM_RETRY_ATTEMPTS")
+    prom_retry_backoff_base: float = Field(default=0.5, gt=0, env="PROM_RETRY_BACKOFF_BASE")
+    prom_retry_backoff_max: float = Field(default=10.0, gt=0, env="PROM_RETRY_BACKOFF_MAX")
+    prom_breaker_failures: int = Field(default=5, ge=1, env="PROM_BREAKER_FAILURES")
+    prom_breaker_reset: float = Field(default=30.0, gt=0, env="PROM_BREAKER_RESET")
+    http_max_connections: int = Field(default=20, ge=1, env="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive_connections: int = Field(
+        default=10, ge=0, env="HTTP_MAX_KEEPALIVE_CONNECTIONS"
+    )
+    http_keepalive_expiry: float = Field(default=30.0, ge=0, env="HTTP_KEEPALIVE_EXPIRY")
+    http2: bool = Field(default=False, env="HTTP2")
+    http_connect_timeout: float = Field(default=5.0, gt=0, env="HTTP_CONNECT_TIMEOUT")
+    http_read_timeout: float = Field(default=30.0, gt=0, env="HTTP_READ_TIMEOUT")
+    http_write_timeout: float = Field(default=10.0, gt=0, env="HTTP_WRITE_TIMEOUT")
+    http_pool_timeout: float = Field(default=10.0, gt=0, env="HTTP_POOL_TIMEOUT")
+    http_accept_encoding: str = Field(default="gzip, deflate", env="HTTP_ACCEPT_ENCODING")
     prom_base_url: str = Field(
         default="https://prom.ua/search",
         env="PROM_SEARCH_URL",
     )
+    cpu_executor: Literal["inline", "thread", "process"] = Field(
+        default="thread", env="CPU_EXECUTOR"
+    )
+    cpu_executor_workers: int = Field(default=2, ge=1, env="CPU_EXECUTOR_WORKERS")
+    cpu_executor_max_pending: int = Field(default=32, ge=1, env="CPU_EXECUTOR_MAX_PENDING")
+    metrics_host: str = Field(default="127.0.0.1", env="METRICS_HOST")
+    metrics_port: int = Field(default=9101, ge=0, le=65535, env="METRICS_PORT")
+    loop_lag_interval: float = Field(default=0.5, gt=0, env="LOOP_LAG_INTERVAL")
     developer_contact_url: str = Field(default="", env="DEVELOPER_CONTACT_URL")
     order_parser_url: str = Field(default="", env="ORDER_PARSER_URL")
     boost_products_url: str = Field(default="", env="BOOST_PRODUCTS_URL")
 
     _channels: List[str] = PrivateAttr(default_factory=list)
+    _premium_user_ids: Set[int] = PrivateAttr(default_factory=set)
 
     def __init__(self, **data):
         super().__init__(**data)
         raw = self.required_channels_raw or ""
         if raw:
             self._channels = [item.strip() for item in raw.split(",") if item.strip()]
+        premium_raw = self.premium_user_ids_raw or ""
+        if premium_raw:
+            self._premium_user_ids = {
+                int(item) for item in premium_raw.split(",") if item.strip().isdigit()
+            }
 
     @property
     def required_channels(self) -> List[str]:
         return list(self._channels)
 
+    def is_premium(self, user_id: int) -> bool:
+        return user_id in self._premium_user_ids
+
+    def search_depth(self, user_id: int) -> int:
+        if self.is_premium(user_id):
+            return max(self.premium_search_max_pages, self.search_max_pages)
+        return self.search_max_pages
+
 
 @lru_cache(maxsize=1)
 def load_config() -> Config:
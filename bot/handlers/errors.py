@@ -5,10 +5,13 @@ import logging
 from aiogram import Router
 from aiogram.types import ErrorEvent
 
+from ..utils.metrics import HANDLER_ERRORS
+
 router = Router()
 logger = logging.getLogger(__name__)
 
 
 @router.errors()
 async def handle_error(event: ErrorEvent) -> None:
+    HANDLER_ERRORS.inc(type(event.exception).__name__)
     logger.exception("Unhandled error: %s", event.exception)
@@ -1,32 +1,31 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import List
-
-import httpx
 from aiogram import Router
-from aiogram.types import BufferedInputFile, Message
+from aiogram.types import Message
 
 from ..config import Config
-from ..repository import Database
-from ..repository.search_logs import add_queries
-from ..repository.users import ensure_user
-from ..schemas import Product, SearchResult
-from ..services.prom_scraper import PromScraper
+from ..services.jobs import FairJobQueue, QueueClosed, QueueFull
 from ..services.query_parser import split_queries
-from ..services.rate_limit import check_limit
-from ..services.subscription import check_subscription
-from ..utils.text import render_excel
+from ..services.rate_limit import QuotaTracker
+from ..services.scheduler import Requester
+from ..services.search_jobs import SearchJob
+from ..services.subscription import SubscriptionChecker
+from ..services.users import UserRegistry
+from ..utils.metrics import STAGE_SECONDS
 
 router = Router()
 
+BUSY_TEXT = "Предыдущие запросы ещё обрабатываются. Дождитесь результата и отправьте новые."
+
 
 @router.message()
 async def handle_search(
     message: Message,
     config: Config,
-    db: Database,
-    scraper: PromScraper,
+    users: UserRegistry,
+    quota: QuotaTracker,
+    subscriptions: SubscriptionChecker,
+    jobs: FairJobQueue[SearchJob],
 ) -> None:
     if not message.text:
         return
@@ -36,11 +35,12 @@ async def handle_search(
         await message.answer("Введите хотя бы один поисковый запрос.")
         return
 
-    await ensure_user(db, message.from_user)
+    await users.ensure(message.from_user)
 
-    missing_channels = await check_subscription(
-        message.bot, message.from_user.id, config.required_channels
-    )
+    with STAGE_SECONDS.time("subscription"):
+        missing_channels = await subscriptions.missing_channels(
+            message.bot, message.from_user.id, config.required_channels
+        )
     if missing_channels:
         channels_list = ", ".join(missing_channels)
         await message.answer(
@@ -49,10 +49,16 @@ async def handle_search(
         )
         return
 
-    limit_status = await check_limit(
-        db, message.from_user.id, config.daily_query_limit, len(queries)
-    )
-    if limit_status.remaining <= 0:
+    # Быстрая проверка до резервирования лимита; окончательная — в jobs.submit.
+    if jobs.pending_for(message.from_user.id) >= config.max_jobs_per_user:
+        await message.answer(BUSY_TEXT)
+        return
+
+    with STAGE_SECONDS.time("quota_reserve"):
+        reservation = await quota.reserve(
+            message.from_user.id, config.daily_query_limit, len(queries)
+        )
+    if reservation.granted <= 0:
         contact = config.order_parser_url or "@mashulia_prom"
         await message.answer(
             "Дневной лимит запросов исчерпан. Оформите безлимит за $20/30 дней — "
@@ -60,43 +66,36 @@ async def handle_search(
         )
         return
 
-    allowed_queries = queries[: limit_status.remaining]
-    skipped = queries[limit_status.remaining :]
-
-    now = datetime.utcnow()
-    results: List[SearchResult] = []
-
-    for query in allowed_queries:
-        try:
-            products = await scraper.fetch_first_page(query)
-        except (httpx.HTTPError, ValueError) as error:
-            await message.answer(f"Не удалось обработать запрос '{query}': {error}")
-            results.append(SearchResult(query=query, products=[], fetched_at=now))
-            continue
-        results.append(SearchResult(query=query, products=products, fetched_at=now))
-
-    processed_count = len(results)
-    remaining_after = max(limit_status.remaining - processed_count, 0)
-    used_after = limit_status.used + processed_count
-
-    if results:
-        await add_queries(db, message.from_user.id, [item.query for item in results])
-        excel_buffer = render_excel(results)
-        timestamp = now.strftime("%Y_%m_%d")
-        file = BufferedInputFile(
-            excel_buffer.getvalue(),
-            filename=f"prom_{timestamp}.xlsx",
-        )
-        caption = (
-            f"Результаты поиска Prom.ua\n"
-            f"Использовано запросов: {used_after}/{config.daily_query_limit}"
-        )
-        await message.answer_document(file, caption=caption)
-    else:
-        await message.answer("Ничего не удалось собрать. Попробуйте позже.")
-
-    if skipped:
-        skipped_text = ", ".join(skipped)
-        await message.answer(
-            f"Лимит на сегодня почти исчерпан. Эти запросы не обработаны: {skipped_text}"
+    user_id = message.from_user.id
+    premium = config.is_premium(user_id)
+    requester = Requester(
+        user_id=user_id,
+        weight=config.premium_weight if premium else 1.0,
+        max_concurrency=(
+            config.premium_user_concurrency if premium else config.user_concurrency
+        ),
+        priority="premium" if premium else "standard",
+    )
+    try:
+        # Всё, что может упасть после резервирования, должно вернуть лимит.
+        progress = await message.answer("Запрос принят и стоит в очереди…")
+        job = SearchJob(
+            chat_id=message.chat.id,
+            user_id=message.from_user.id,
+            queries=queries[: reservation.granted],
+            skipped=queries[reservation.granted :],
+            reservation=reservation,
+            max_pages=config.search_depth(user_id),
+            requester=requester,
+            progress_message_id=progress.message_id,
         )
+        await jobs.submit(message.from_user.id, job, max_pending=config.max_jobs_per_user)
+    except QueueFull:
+        await quota.refund(reservation, reservation.granted)
+        await progress.edit_text(BUSY_TEXT)
+    except QueueClosed:
+        await quota.refund(reservation, reservation.granted)
+        await progress.edit_text("Бот перезапускается, попробуйте через минуту.")
+    except BaseException:
+        await quota.refund(reservation, reservation.granted)
+        raise
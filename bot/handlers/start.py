@@ -5,8 +5,7 @@ from aiogram.filters import Command, CommandStart
 from aiogram.types import Message
 
 from ..config import Config
-from ..repository import Database
-from ..repository.users import ensure_user
+from ..services.users import UserRegistry
 
 router = Router()
 
@@ -19,8 +18,8 @@ HELP_TEXT = (
 
 
 @router.message(CommandStart())
-async def handle_start(message: Message, config: Config, db: Database) -> None:
-    await ensure_user(db, message.from_user)
+async def handle_start(message: Message, config: Config, users: UserRegistry) -> None:
+    await users.ensure(message.from_user)
     channels = ", ".join(config.required_channels) if config.required_channels else "—"
     await message.answer(
         "Привет, отправь мне поисковые запросы через запятую или точку, и я пришлю товары с первой страницы Prom.ua.\n"
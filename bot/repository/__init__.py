@@ -1,43 +1,146 @@
 from __future__ import annotations
 
-from typing import Any, Iterable, Optional
+import copy
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterable, Optional, Sequence
 
 import asyncpg
 
+from ..utils.metrics import DB_POOL_WAIT_SECONDS
+
+
+@dataclass
+class PoolStats:
+    size: int
+    idle: int
+    max_size: int
+    acquisitions: int
+    waiting: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+
+    @property
+    def wait_seconds_avg(self) -> float:
+        return self.wait_seconds_total / self.acquisitions if self.acquisitions else 0.0
+
+
+class _PoolWaits:
+    def __init__(self) -> None:
+        self.acquisitions = 0
+        self.waiting = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.acquisitions += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
 
 class Database:
-    """Thin asyncpg wrapper to keep SQL close to services."""
+    """Thin asyncpg wrapper to keep SQL close to services.
+
+    ``transaction()`` yields a ``Database`` bound to one acquired connection,
+    so repository functions can be reused inside it.
+    """
 
-    def __init__(self, dsn: str) -> None:
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 5,
+        max_inactive_connection_lifetime: float = 300.0,
+        statement_cache_size: int = 100,
+        command_timeout: Optional[float] = None,
+    ) -> None:
         self._dsn = dsn
+        self._max_size = max(1, max_size)
+        self._min_size = min(max(0, min_size), self._max_size)
+        self._max_inactive_connection_lifetime = max_inactive_connection_lifetime
+        self._statement_cache_size = statement_cache_size
+        self._command_timeout = command_timeout or None
         self._pool: Optional[asyncpg.Pool] = None
+        self._connection: Optional[asyncpg.Connection] = None
+        self._waits = _PoolWaits()
 
     async def connect(self) -> None:
         if self._pool is None:
-            self._pool = await asyncpg.create_pool(dsn=self._dsn, min_size=1, max_size=5)
+            self._pool = await asyncpg.create_pool(
+                dsn=self._dsn,
+                min_size=self._min_size,
+                max_size=self._max_size,
+                max_inactive_connection_lifetime=self._max_inactive_connection_lifetime,
+                statement_cache_size=self._statement_cache_size,
+                command_timeout=self._command_timeout,
+            )
 
     async def disconnect(self) -> None:
         if self._pool is not None:
             await self._pool.close()
             self._pool = None
 
-    async def fetch(self, query: str, *args: Any) -> Iterable[asyncpg.Record]:
+    @property
+    def pool_stats(self) -> PoolStats:
+        return PoolStats(
+            size=self._pool.get_size() if self._pool is not None else 0,
+            idle=self._pool.get_idle_size() if self._pool is not None else 0,
+            max_size=self._max_size,
+            acquisitions=self._waits.acquisitions,
+            waiting=self._waits.waiting,
+            wait_seconds_total=self._waits.total,
+            wait_seconds_max=self._waits.max,
+        )
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Database]:
+        async with self._acquire() as connection:
+            bound = copy.copy(self)
+            bound._connection = connection
+            async with connection.transaction():
+                yield bound
+
+    @asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        if self._connection is not None:
+            yield self._connection
+            return
         assert self._pool is not None, "Database pool is not initialized"
-        async with self._pool.acquire() as connection:
+        started = time.perf_counter()
+        self._waits.waiting += 1
+        try:
+            connection = await self._pool.acquire()
+        finally:
+            self._waits.waiting -= 1
+        waited = time.perf_counter() - started
+        self._waits.record(waited)
+        DB_POOL_WAIT_SECONDS.observe(waited)
+        try:
+            yield connection
+        finally:
+            await self._pool.release(connection)
+
+    async def fetch(self, query: str, *args: Any) -> Iterable[asyncpg.Record]:
+        async with self._acquire() as connection:
             return await connection.fetch(query, *args)
 
     async def fetchrow(self, query: str, *args: Any) -> Optional[asyncpg.Record]:
-        assert self._pool is not None, "Database pool is not initialized"
-        async with self._pool.acquire() as connection:
+        async with self._acquire() as connection:
             return await connection.fetchrow(query, *args)
 
     async def fetchval(self, query: str, *args: Any) -> Any:
-        assert self._pool is not None, "Database pool is not initialized"
-        async with self._pool.acquire() as connection:
+        async with self._acquire() as connection:
             return await connection.fetchval(query, *args)
 
     async def execute(self, query: str, *args: Any) -> str:
-        assert self._pool is not None, "Database pool is not initialized"
-        async with self._pool.acquire() as connection:
+        async with self._acquire() as connection:
             return await connection.execute(query, *args)
 
+    async def copy_records(
+        self, table: str, records: Iterable[Sequence[Any]], columns: Sequence[str]
+    ) -> str:
+        async with self._acquire() as connection:
+            return await connection.copy_records_to_table(
+                table, records=records, columns=list(columns)
+            )
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Sequence, Tuple
+
+from . import Database
+
+
+async def reserve_queries(
+    db: Database, user_id: int, capacity: int, requested: int
+) -> Tuple[int, int, date]:
+    """Atomically reserve up to ``requested`` of today's quota for the user.
+
+    In ``ON CONFLICT DO UPDATE`` every expression sees the row as it was
+    before the update, so ``granted`` and ``used`` are computed from one
+    consistent value under the row lock. Returns ``(granted, used_after, day)``.
+    """
+    query = """
+        INSERT INTO daily_usage AS u (user_id, day, used, granted)
+        VALUES (
+            $1,
+            timezone('UTC', now())::date,
+            LEAST($3::int, $2::int),
+            LEAST($3::int, $2::int)
+        )
+        ON CONFLICT (user_id, day) DO UPDATE
+            SET granted = LEAST($3::int, GREATEST($2::int - u.used, 0)),
+                used = u.used + LEAST($3::int, GREATEST($2::int - u.used, 0))
+        RETURNING granted, used, day
+    """
+    record = await db.fetchrow(query, user_id, capacity, requested)
+    return int(record["granted"]), int(record["used"]), record["day"]
+
+
+async def refund_queries(db: Database, user_id: int, day: date, count: int) -> None:
+    if count <= 0:
+        return
+    query = """
+        UPDATE daily_usage
+        SET used = GREATEST(used - $3, 0)
+        WHERE user_id = $1
+          AND day = $2
+    """
+    await db.execute(query, user_id, day, count)
+
+
+async def get_usage(db: Database, user_id: int, day: date) -> int:
+    query = """
+        SELECT used
+        FROM daily_usage
+        WHERE user_id = $1
+          AND day = $2
+    """
+    value = await db.fetchval(query, user_id, day)
+    return int(value or 0)
+
+
+async def add_usage_batch(
+    db: Database, rows: Sequence[Tuple[int, date, int]]
+) -> None:
+    if not rows:
+        return
+    query = """
+        INSERT INTO daily_usage AS u (user_id, day, used)
+        SELECT user_id, day, delta
+        FROM unnest($1::bigint[], $2::date[], $3::int[]) AS t(user_id, day, delta)
+        ON CONFLICT (user_id, day) DO UPDATE
+            SET used = u.used + EXCLUDED.used
+    """
+    user_ids, days, deltas = zip(*rows)
+    await db.execute(query, list(user_ids), list(days), list(deltas))
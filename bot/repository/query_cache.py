@@ -2,45 +2,45 @@ from __future__ import annotations
 
 import json
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, Optional, Tuple
 
 from . import Database
 
 
-async def get_cached(
-    db: Database, user_id: int, query: str, now: datetime
-) -> Optional[dict]:
+async def get_cached_entry(
+    db: Database, query: str, now: datetime
+) -> Optional[Tuple[Any, datetime]]:
     sql = """
-        SELECT payload
+        SELECT payload, expires_at
         FROM query_cache
-        WHERE user_id = $1
-          AND query = $2
-          AND expires_at > $3
-        ORDER BY created_at DESC
-        LIMIT 1
+        WHERE query = $1
+          AND expires_at > $2
     """
-    record = await db.fetchrow(sql, user_id, query, now)
+    record = await db.fetchrow(sql, query, now)
     if record is None:
         return None
     payload = record["payload"]
     if isinstance(payload, str):
         try:
-            return json.loads(payload)
+            payload = json.loads(payload)
         except json.JSONDecodeError:
             return None
-    return payload
+    return payload, record["expires_at"]
 
 
 async def store_cache(
     db: Database,
-    user_id: int,
     query: str,
-    payload: dict[str, Any],
+    payload: Any,
     expires_at: datetime,
 ) -> None:
     sql = """
-        INSERT INTO query_cache (user_id, query, payload, expires_at)
-        VALUES ($1, $2, $3, $4)
+        INSERT INTO query_cache (query, payload, expires_at)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (query) DO UPDATE
+            SET payload = EXCLUDED.payload,
+                expires_at = EXCLUDED.expires_at,
+                created_at = now()
     """
-    payload_json = json.dumps(payload, ensure_ascii=False)
-    await db.execute(sql, user_id, query, payload_json, expires_at)
+    payload_json = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    await db.execute(sql, query, payload_json, expires_at)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import List, Sequence
 
@@ -26,3 +27,27 @@ class SearchResult(BaseModel):
     query: str
     products: List[Product] = Field(default_factory=list)
     fetched_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+@dataclass(slots=True)
+class ProductRecord:
+    """Internal product row for the scrape -> cache -> render path.
+
+    Same fields as :class:`Product`, without per-instance validation; values
+    are already normalized strings when the scraper builds them.
+    """
+
+    url: str
+    name: str
+    price: str = ""
+    presence: str = ""
+    seller: str = ""
+    manufacturer: str = ""
+
+
+@dataclass(slots=True)
+class QueryResult:
+    query: str
+    products: List[ProductRecord] = field(default_factory=list)
+    fetched_at: datetime = field(default_factory=datetime.utcnow)
+
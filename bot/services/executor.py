@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Literal, Optional, TypeVar
+
+T = TypeVar("T")
+
+ExecutorKind = Literal["inline", "thread", "process"]
+
+
+def _warm_worker() -> None:
+    # Импорт тяжёлых модулей заранее, чтобы первый запрос не платил за него.
+    from . import prom_utils  # noqa: F401
+    from ..utils import text  # noqa: F401
+
+
+def _noop() -> None:
+    return None
+
+
+@dataclass
+class ExecutorStats:
+    kind: str
+    workers: int
+    running: int
+    waiting: int
+
+
+class CpuExecutor:
+    """Runs CPU-bound parsing and rendering off the asyncio event loop.
+
+    At most ``max_pending`` jobs are handed to the pool at once; further callers
+    wait on the loop, so the pool queue stays bounded and ``waiting`` shows the
+    backlog.
+    """
+
+    def __init__(
+        self,
+        kind: ExecutorKind = "thread",
+        max_workers: int = 2,
+        max_pending: int = 32,
+    ) -> None:
+        self._kind = kind
+        self._max_workers = max(1, max_workers)
+        self._slots = asyncio.Semaphore(max(1, max_pending))
+        self._executor: Optional[Executor] = None
+        self._running = 0
+        self._waiting = 0
+
+    @property
+    def stats(self) -> ExecutorStats:
+        return ExecutorStats(
+            kind=self._kind,
+            workers=self._max_workers if self._kind != "inline" else 0,
+            running=self._running,
+            waiting=self._waiting,
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return self._running + self._waiting
+
+    async def start(self) -> None:
+        if self._executor is not None or self._kind == "inline":
+            return
+        if self._kind == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+            )
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(
+                *(loop.run_in_executor(self._executor, _noop) for _ in range(self._max_workers))
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="cpu",
+            )
+
+    async def shutdown(self) -> None:
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        await asyncio.get_running_loop().run_in_executor(
+            None, partial(executor.shutdown, wait=True, cancel_futures=True)
+        )
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        if self._executor is None:
+            return func(*args)
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args))
+        finally:
+            self._running -= 1
+            self._slots.release()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from ..utils.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class QueueClosed(Exception):
+    """Raised by :meth:`FairJobQueue.submit` once shutdown has started."""
+
+
+class QueueFull(Exception):
+    """Raised by :meth:`FairJobQueue.submit` when the user already has ``max_pending`` jobs waiting."""
+
+
+class FairJobQueue(Generic[T]):
+    """In-process job queue with a worker pool and round-robin between users.
+
+    Each user has their own FIFO. Workers take one job from the next user in
+    the ring, so a user with many queued jobs cannot hold back others, and a
+    user never has more than one job running at a time. ``workers`` is the
+    global concurrency cap.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[T], Awaitable[None]],
+        workers: int = 4,
+        on_drop: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> None:
+        self._handler = handler
+        self._on_drop = on_drop
+        self._worker_count = max(1, workers)
+        self._pending: Dict[int, Deque[Tuple[float, T]]] = {}
+        # Пользователи, у которых есть ожидающие задачи и нет выполняющейся.
+        self._ready: Deque[int] = deque()
+        self._running: Dict[int, int] = {}
+        self._wakeup = asyncio.Condition()
+        self._workers: List[asyncio.Task[None]] = []
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        return sum(len(jobs) for jobs in self._pending.values())
+
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+
+    def pending_for(self, user_id: int) -> int:
+        """Jobs of the user waiting in the queue, not counting the one running."""
+        return len(self._pending.get(user_id, ()))
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._work()) for _ in range(self._worker_count)
+            ]
+
+    async def submit(self, user_id: int, job: T, max_pending: Optional[int] = None) -> None:
+        if self._closing:
+            raise QueueClosed()
+        async with self._wakeup:
+            # Проверка и постановка в очередь под одним локом, без await между ними.
+            if max_pending is not None and self.pending_for(user_id) >= max_pending:
+                raise QueueFull()
+            jobs = self._pending.setdefault(user_id, deque())
+            jobs.append((time.perf_counter(), job))
+            if len(jobs) == 1 and not self._running.get(user_id):
+                self._ready.append(user_id)
+            self._wakeup.notify()
+
+    async def close(self, timeout: float) -> None:
+        """Stop accepting jobs, let workers finish the queue for up to ``timeout``."""
+        self._closing = True
+        async with self._wakeup:
+            self._wakeup.notify_all()
+        if self._workers:
+            _, still_running = await asyncio.wait(self._workers, timeout=timeout)
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
+        for jobs in self._pending.values():
+            while jobs:
+                _, job = jobs.popleft()
+                if self._on_drop is not None:
+                    await self._on_drop(job)
+        self._pending.clear()
+        self._ready.clear()
+
+    async def _next(self) -> Optional[Tuple[int, float, T]]:
+        async with self._wakeup:
+            while not self._ready:
+                if self._closing and not self.pending:
+                    return None
+                await self._wakeup.wait()
+            user_id = self._ready.popleft()
+            queued_at, job = self._pending[user_id].popleft()
+            if not self._pending[user_id]:
+                del self._pending[user_id]
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            return user_id, queued_at, job
+
+    async def _done(self, user_id: int) -> None:
+        async with self._wakeup:
+            self._running[user_id] -= 1
+            if not self._running[user_id]:
+                del self._running[user_id]
+            if self._pending.get(user_id):
+                self._ready.append(user_id)
+                self._wakeup.notify()
+            elif self._closing:
+                self._wakeup.notify_all()
+
+    async def _work(self) -> None:
+        while True:
+            item = await self._next()
+            if item is None:
+                return
+            user_id, queued_at, job = item
+            STAGE_SECONDS.observe(time.perf_counter() - queued_at, "queue_wait")
+            try:
+                await self._handler(job)
+            except Exception:  # noqa: BLE001 - одна задача не должна останавливать воркер
+                logger.exception("Job for user %s failed", user_id)
+            finally:
+                await self._done(user_id)
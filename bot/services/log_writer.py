@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import logging
+from datetime import datetime
+from typing import Generic, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+import asyncpg
+
+from ..repository import Database
+from ..repository import search_logs
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_TRANSIENT_SQLSTATES = ("40001", "40P01")
+_TRANSIENT_SQLSTATE_CLASSES = ("08", "53", "57")
+_DATA_SQLSTATE_CLASSES = ("22", "23")
+
+LogRecord = Tuple[int, str, datetime]
+
+
+class BatchWriter(abc.ABC, Generic[T]):
+    """Background writer that buffers items and flushes them in batches.
+
+    A batch is written once ``batch_size`` items are buffered or
+    ``flush_interval`` seconds have passed. :meth:`put` waits while the buffer
+    holds ``max_buffer`` items, so producers slow down instead of growing
+    memory. :meth:`close` drains the buffer. Transient failures (lost
+    connection, timeouts, serialization conflicts) are retried; during shutdown
+    only a few attempts are made before the batch is dropped. A batch rejected
+    for its data (SQLSTATE classes 22 and 23) is split in halves until the
+    offending items are isolated and dropped; any other error drops the batch.
+    """
+
+    SHUTDOWN_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        max_buffer: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = flush_interval
+        self._queue: asyncio.Queue[T] = asyncio.Queue(maxsize=max(1, max_buffer))
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        while not self._queue.empty():
+            await self._write_with_retry(self._take_batch())
+
+    async def put(self, item: T) -> None:
+        await self._queue.put(item)
+
+    async def put_many(self, items: Iterable[T]) -> None:
+        for item in items:
+            await self._queue.put(item)
+
+    @abc.abstractmethod
+    async def _write(self, batch: Sequence[T]) -> None:
+        """Persist one batch; see the class docstring for how errors are handled."""
+
+    def _take_batch(self) -> List[T]:
+        batch: List[T] = []
+        while len(batch) < self._batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _wait_stopping(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                if self._queue.empty():
+                    await self._wait_stopping(self._flush_interval)
+                    continue
+                if self._queue.qsize() < self._batch_size:
+                    # Копим пачку до batch_size или до конца интервала.
+                    await self._wait_stopping(self._flush_interval)
+                await self._write_with_retry(self._take_batch())
+            except Exception:
+                # Фоновая задача не должна умирать: иначе буфер перестанет
+                # разбираться, а close() упадёт и не даст закрыть базу.
+                logger.exception("%s flush loop failed", type(self).__name__)
+
+    async def _write_with_retry(self, batch: Sequence[T]) -> None:
+        if not batch:
+            return
+        attempt = 0
+        while True:
+            try:
+                await self._write(batch)
+                return
+            except Exception as error:
+                if _is_data_error(error):
+                    await self._split_rejected(batch, error)
+                    return
+                if not _is_transient(error):
+                    logger.exception(
+                        "%s dropped %d items after unexpected error",
+                        type(self).__name__,
+                        len(batch),
+                    )
+                    return
+                attempt += 1
+                if self._stopping.is_set() and attempt >= self.SHUTDOWN_ATTEMPTS:
+                    logger.error(
+                        "%s dropped %d items after failed shutdown flush: %s",
+                        type(self).__name__,
+                        len(batch),
+                        error,
+                    )
+                    return
+                logger.warning("%s flush failed, retrying: %s", type(self).__name__, error)
+                await asyncio.sleep(min(self._flush_interval * attempt, 30.0))
+
+    async def _split_rejected(self, batch: Sequence[T], error: Exception) -> None:
+        if len(batch) == 1:
+            logger.error(
+                "%s dropped item rejected by the database: %s (%r)",
+                type(self).__name__,
+                error,
+                batch[0],
+            )
+            return
+        middle = len(batch) // 2
+        await self._write_with_retry(batch[:middle])
+        await self._write_with_retry(batch[middle:])
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (OSError, asyncio.TimeoutError, asyncpg.PostgresConnectionError)):
+        return True
+    if isinstance(error, asyncpg.PostgresError):
+        sqlstate = error.sqlstate or ""
+        return sqlstate in _TRANSIENT_SQLSTATES or sqlstate[:2] in _TRANSIENT_SQLSTATE_CLASSES
+    return False
+
+
+def _is_data_error(error: Exception) -> bool:
+    return (
+        isinstance(error, asyncpg.PostgresError)
+        and (error.sqlstate or "")[:2] in _DATA_SQLSTATE_CLASSES
+    )
+
+
+class SearchLogWriter(BatchWriter[LogRecord]):
+    """Buffers ``search_logs`` rows and writes them with a single COPY per batch."""
+
+    def __init__(
+        self,
+        db: Database,
+        max_buffer: int = 10000,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+    ) -> None:
+        super().__init__(max_buffer=max_buffer, batch_size=batch_size, flush_interval=flush_interval)
+        self._db = db
+
+    async def add(
+        self, user_id: int, queries: Iterable[str], created_at: Optional[datetime] = None
+    ) -> None:
+        created_at = created_at or datetime.utcnow()
+        await self.put_many((user_id, query, created_at) for query in queries)
+
+    async def _write(self, batch: Sequence[LogRecord]) -> None:
+        await search_logs.copy_log_records(self._db, batch)
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Tuple
+
+import asyncpg
+
+from ..repository import Database
+from ..repository.query_cache import get_cached_entry, store_cache
+from ..schemas import ProductRecord
+from .prom_utils import ListingPage
+from ..utils.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_VERSION = 1
+# Товары хранятся списками значений в порядке полей, а не словарями, чтобы
+# не повторять имена ключей в каждой строке кэша.
+PRODUCT_FIELDS = ("url", "name", "price", "presence", "seller", "manufacturer")
+
+
+def encode_page(page: ListingPage) -> dict[str, Any]:
+    return {
+        "v": PAYLOAD_VERSION,
+        "items": [[getattr(product, name) for name in PRODUCT_FIELDS] for product in page.products],
+        "limit": page.limit,
+        "total": page.total,
+    }
+
+
+def decode_page(payload: Any) -> Optional[ListingPage]:
+    if not isinstance(payload, dict) or payload.get("v") != PAYLOAD_VERSION:
+        return None
+    items = payload.get("items")
+    if not isinstance(items, list):
+        return None
+    width = len(PRODUCT_FIELDS)
+    for row in items:
+        if (
+            not isinstance(row, list)
+            or len(row) != width
+            or not all(isinstance(value, str) for value in row)
+        ):
+            return None
+    # Записи без limit/total сохранены до многостраничного поиска: считаем их одной страницей.
+    limit = payload.get("limit", 1)
+    total = payload.get("total", 0)
+    if not isinstance(limit, int) or not isinstance(total, int):
+        return None
+    return ListingPage([ProductRecord(*row) for row in items], limit=limit, total=total)
+
+
+def _copy_page(page: ListingPage) -> ListingPage:
+    return ListingPage(list(page.products), limit=page.limit, total=page.total)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    size: int = 0
+
+
+class MemoryCache:
+    """Bounded in-process LRU of first result pages with per-entry expiry.
+
+    Expired entries are kept for another ``stale_seconds`` so that
+    :meth:`get_stale` can still serve them while Prom.ua is unavailable.
+    """
+
+    def __init__(self, max_entries: int, stale_seconds: float = 0.0) -> None:
+        self._max_entries = max_entries
+        self._stale_seconds = max(stale_seconds, 0.0)
+        self._entries: "OrderedDict[str, Tuple[float, ListingPage]]" = OrderedDict()
+        self._stats = CacheStats()
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self._stats.hits,
+            misses=self._stats.misses,
+            evictions=self._stats.evictions,
+            expirations=self._stats.expirations,
+            size=len(self._entries),
+        )
+
+    def get(self, key: str) -> Optional[ListingPage]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats.misses += 1
+            return None
+        expires_at, page = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if expires_at + self._stale_seconds <= now:
+                del self._entries[key]
+            self._stats.expirations += 1
+            self._stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats.hits += 1
+        return _copy_page(page)
+
+    def get_stale(self, key: str) -> Optional[ListingPage]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, page = entry
+        if expires_at + self._stale_seconds <= time.monotonic():
+            del self._entries[key]
+            return None
+        return _copy_page(page)
+
+    def put(self, key: str, page: ListingPage, ttl_seconds: float) -> None:
+        if self._max_entries <= 0 or ttl_seconds <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl_seconds, _copy_page(page))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+
+class ProductCache:
+    """Search results cache shared by all users, keyed by normalized query.
+
+    Lookups go through the in-process :class:`MemoryCache` first and fall back
+    to the ``query_cache`` table in Postgres. :meth:`get_stale` also accepts
+    entries that expired less than ``stale_seconds`` ago.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        ttl_seconds: int,
+        memory_max_entries: int = 0,
+        stale_seconds: int = 0,
+    ) -> None:
+        self._db = db
+        self._ttl = timedelta(seconds=ttl_seconds)
+        self._stale = timedelta(seconds=max(stale_seconds, 0))
+        self._memory = MemoryCache(memory_max_entries, self._stale.total_seconds())
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl.total_seconds() > 0
+
+    @property
+    def memory_stats(self) -> CacheStats:
+        return self._memory.stats
+
+    async def get(self, key: str) -> Optional[ListingPage]:
+        if not self.enabled:
+            return None
+        page = self._memory.get(key)
+        if page is not None:
+            CACHE_LOOKUPS.inc("memory", "hit")
+            return page
+        CACHE_LOOKUPS.inc("memory", "miss")
+
+        now = datetime.utcnow()
+        try:
+            entry = await get_cached_entry(self._db, key, now)
+        except (asyncpg.PostgresError, OSError) as error:
+            CACHE_LOOKUPS.inc("postgres", "error")
+            logger.warning("Query cache read failed for %r: %s", key, error)
+            return None
+        if entry is None:
+            CACHE_LOOKUPS.inc("postgres", "miss")
+            return None
+        CACHE_LOOKUPS.inc("postgres", "hit")
+        payload, expires_at = entry
+        if expires_at.tzinfo is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        page = decode_page(payload)
+        if page is not None:
+            self._memory.put(key, page, (expires_at - now).total_seconds())
+        return page
+
+    async def get_stale(self, key: str) -> Optional[ListingPage]:
+        if not self.enabled or not self._stale:
+            return None
+        page = self._memory.get_stale(key)
+        if page is None:
+            try:
+                entry = await get_cached_entry(self._db, key, datetime.utcnow() - self._stale)
+            except (asyncpg.PostgresError, OSError) as error:
+                logger.warning("Query cache stale read failed for %r: %s", key, error)
+                entry = None
+            page = decode_page(entry[0]) if entry is not None else None
+        CACHE_LOOKUPS.inc("stale", "hit" if page is not None else "miss")
+        return page
+
+    async def store(self, key: str, page: ListingPage) -> None:
+        if not self.enabled:
+            return
+        self._memory.put(key, page, self._ttl.total_seconds())
+        expires_at = datetime.utcnow() + self._ttl
+        try:
+            await store_cache(self._db, key, encode_page(page), expires_at)
+        except (asyncpg.PostgresError, OSError) as error:
+            logger.warning("Query cache write failed for %r: %s", key, error)
@@ -1,12 +1,39 @@
 from __future__ import annotations
 
-from typing import List
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 from urllib.parse import urlsplit
 
 import httpx
 
-from ..schemas import Product
-from .prom_utils import extract_listing_entry, normalize_product
+from ..schemas import ProductRecord
+from ..utils.metrics import PROM_RESPONSES, STAGE_SECONDS
+from .executor import CpuExecutor
+from .product_cache import ProductCache
+from .prom_utils import ListingPage, build_page_url, parse_listing_page
+from .query_parser import normalize_query
+from .scheduler import FairScheduler, Requester, SharedSlot
+from .throttle import (
+    AdaptiveTokenBucket,
+    CircuitBreaker,
+    CircuitOpenError,
+    backoff_delay,
+    parse_retry_after,
+)
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_HEADERS = {
     "User-Agent": (
@@ -17,59 +44,299 @@ DEFAULT_HEADERS = {
     "Accept-Language": "ru,uk;q=0.8,en;q=0.6",
 }
 
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+# 500 обычно относится к конкретной странице, а не к хосту: такой ответ
+# повторяем, но цепь из-за него не размыкаем.
+BREAKER_STATUSES = {429, 502, 503, 504}
+FETCH_ERRORS: Tuple[type, ...] = (httpx.HTTPError, ValueError, CircuitOpenError)
+
+
+@dataclass
+class FetchOutcome:
+    query: str
+    products: List[ProductRecord] = field(default_factory=list)
+    error: Optional[Exception] = None
+
+
+@dataclass
+class ThrottleSettings:
+    rate: float = 5.0
+    min_rate: float = 0.5
+    max_rate: float = 20.0
+    retry_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 10.0
+    breaker_failures: int = 5
+    breaker_reset: float = 30.0
+
+
+@dataclass
+class _SharedLoad:
+    task: asyncio.Task[ListingPage]
+    slot: Optional[SharedSlot]
+
+
+@dataclass
+class _HostGuard:
+    slots: asyncio.Semaphore
+    bucket: AdaptiveTokenBucket
+    breaker: CircuitBreaker
+
+
+def _is_overload(error: Exception) -> bool:
+    if isinstance(error, (CircuitOpenError, httpx.TransportError)):
+        return True
+    return (
+        isinstance(error, httpx.HTTPStatusError)
+        and error.response.status_code in RETRYABLE_STATUSES
+    )
+
 
 class PromScraper:
-    def __init__(self, client: httpx.AsyncClient, base_url: str) -> None:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        base_url: str,
+        cache: Optional[ProductCache] = None,
+        executor: Optional[CpuExecutor] = None,
+        host_concurrency: int = 8,
+        throttle: Optional[ThrottleSettings] = None,
+        scheduler: Optional[FairScheduler] = None,
+    ) -> None:
         self._client = client
         self._base_url = base_url
+        self._cache = cache
+        self._executor = executor
+        self._host_concurrency = max(1, host_concurrency)
+        self._throttle = throttle or ThrottleSettings()
+        self._scheduler = scheduler
+        self._hosts: Dict[str, _HostGuard] = {}
+        self._inflight: Dict[str, _SharedLoad] = {}
 
-    async def fetch_first_page(self, query: str) -> List[Product]:
-        params = {"search_term": query}
-        response = await self._client.get(
-            self._base_url,
-            params=params,
-            headers=DEFAULT_HEADERS,
-            timeout=30.0,
-        )
-        response.raise_for_status()
+    async def fetch_first_page(
+        self, query: str, requester: Optional[Requester] = None
+    ) -> List[ProductRecord]:
+        return list((await self._first_page(query, requester)).products)
+
+    async def _first_page(
+        self, query: str, requester: Optional[Requester] = None
+    ) -> ListingPage:
+        # Одинаковые запросы, пришедшие одновременно, ждут одну общую загрузку.
+        key = normalize_query(query)
+        load = self._inflight.get(key)
+        if load is None:
+            slot = self._scheduler.shared_slot() if self._scheduler is not None else None
+            task = asyncio.create_task(self._load_first_page(key, query, slot))
+            load = _SharedLoad(task, slot)
+            self._inflight[key] = load
+            task.add_done_callback(lambda done: self._forget_inflight(key, done))
+        if load.slot is not None:
+            # Слот под общую загрузку получает тот из ожидающих, чья очередь в
+            # планировщике подойдёт раньше, а не обязательно пришедший первым.
+            load.slot.join(requester)
+        return await asyncio.shield(load.task)
+
+    def _forget_inflight(self, key: str, task: asyncio.Task[ListingPage]) -> None:
+        load = self._inflight.get(key)
+        if load is not None and load.task is task:
+            del self._inflight[key]
+        # Все ожидающие могли быть отменены: помечаем исключение как полученное.
+        if not task.cancelled():
+            task.exception()
+
+    async def _load_first_page(
+        self, key: str, query: str, slot: Optional[SharedSlot] = None
+    ) -> ListingPage:
+        if self._cache is not None:
+            cached = await self._cache.get(key)
+            if cached is not None:
+                return cached
+
+        try:
+            page = await self._download_page(query, 1, shared=slot)
+        except FETCH_ERRORS as error:
+            return await self._stale_or_raise(key, error)
+        if self._cache is not None:
+            await self._cache.store(key, page)
+        return page
 
-        entry = extract_listing_entry(response.text)
-        listing = entry["result"]["listing"]
-        page = listing["page"]
-        raw_products = page.get("products") or []
-
-        company_lookup = {}
-        def register_company(comp: dict) -> None:
-            if not isinstance(comp, dict):
-                return
-            identifier = comp.get("id") or comp.get("companyId")
-            if not identifier:
-                return
-            name = (comp.get("name") or comp.get("title") or "").strip()
-            if name:
-                company_lookup[str(identifier)] = name
-
-        def register_container(container) -> None:
-            if isinstance(container, dict):
-                for key, value in container.items():
-                    if isinstance(value, dict) and (value.get("id") is None):
-                        value = {**value, "id": value.get("id") or key}
-                    register_company(value)
-            elif isinstance(container, list):
-                for comp in container:
-                    register_company(comp)
-
-        register_container(page.get("companies"))
-        register_container(page.get("companiesMap"))
-        register_container(listing.get("companies"))
-        register_container(listing.get("companiesMap"))
+    async def _stale_or_raise(self, key: str, error: Exception) -> ListingPage:
+        # Пока Prom.ua перегружен, лучше отдать устаревшую выдачу, чем ошибку.
+        if self._cache is not None and _is_overload(error):
+            stale = await self._cache.get_stale(key)
+            if stale is not None:
+                logger.warning("Serving stale results for %r: %s", key, error)
+                # Остальные страницы за устаревшей первой не запрашиваем.
+                return ListingPage(stale.products)
+        raise error
+
+    def _page_url(self, query: str, page_number: int) -> str:
+        url = str(httpx.URL(self._base_url, params={"search_term": query}))
+        return build_page_url(url, page_number)
+
+    def _guard_for(self, url: str) -> _HostGuard:
+        host = urlsplit(url).netloc
+        guard = self._hosts.get(host)
+        if guard is None:
+            settings = self._throttle
+            guard = self._hosts[host] = _HostGuard(
+                slots=asyncio.Semaphore(self._host_concurrency),
+                bucket=AdaptiveTokenBucket(
+                    settings.rate,
+                    min_rate=settings.min_rate,
+                    max_rate=settings.max_rate,
+                    burst=self._host_concurrency,
+                ),
+                breaker=CircuitBreaker(settings.breaker_failures, settings.breaker_reset),
+            )
+        return guard
+
+    async def _get(self, url: str, requester: Optional[Requester] = None) -> httpx.Response:
+        if self._scheduler is None or requester is None:
+            return await self._get_guarded(url)
+        async with self._scheduler.slot(requester):
+            return await self._get_guarded(url)
+
+    async def _get_shared(self, url: str, slot: SharedSlot) -> httpx.Response:
+        async with slot:
+            return await self._get_guarded(url)
+
+    async def _get_guarded(self, url: str) -> httpx.Response:
+        """GET through the host's breaker and adaptive limiter, retrying overloads.
+
+        Network errors, 429 and 5xx are retried with jittered exponential
+        backoff, never sooner than ``Retry-After``. A ``Retry-After`` longer
+        than ``backoff_max`` is not waited out inside a user request. The
+        breaker is consulted once and sees one outcome per request, after its
+        retries; a final 500 does not count as a host failure.
+        """
+        guard = self._guard_for(url)
+        settings = self._throttle
+        attempts = max(1, settings.retry_attempts)
+        if not guard.breaker.allow():
+            raise CircuitOpenError("Prom.ua временно недоступен, попробуйте позже")
+        for attempt in range(attempts):
+            retry_after: Optional[float] = None
+            async with guard.slots:
+                await guard.bucket.acquire()
+                try:
+                    with STAGE_SECONDS.time("prom_http"):
+                        response = await self._client.get(url, headers=DEFAULT_HEADERS)
+                except httpx.TransportError:
+                    PROM_RESPONSES.inc("error")
+                    if attempt == attempts - 1:
+                        guard.breaker.record_failure()
+                        raise
+                    response = None
+            if response is not None:
+                PROM_RESPONSES.inc(str(response.status_code))
+                if response.status_code not in RETRYABLE_STATUSES:
+                    guard.breaker.record_success()
+                    guard.bucket.on_success()
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code in THROTTLE_STATUSES:
+                    guard.bucket.on_throttle(retry_after)
+                if attempt == attempts - 1 or (retry_after or 0) > settings.backoff_max:
+                    if response.status_code in BREAKER_STATUSES:
+                        guard.breaker.record_failure()
+                    else:
+                        guard.breaker.record_success()
+                    return response
+            delay = backoff_delay(attempt, settings.backoff_base, settings.backoff_max)
+            await asyncio.sleep(max(delay, retry_after or 0.0))
+        raise RuntimeError("unreachable")
+
+    async def _download_page(
+        self,
+        query: str,
+        page_number: int,
+        requester: Optional[Requester] = None,
+        shared: Optional[SharedSlot] = None,
+    ) -> ListingPage:
+        url = self._page_url(query, page_number)
+        if shared is not None:
+            response = await self._get_shared(url, shared)
+        else:
+            response = await self._get(url, requester)
+        response.raise_for_status()
 
         parts = urlsplit(str(response.url))
         base_root = f"{parts.scheme}://{parts.netloc}"
+        with STAGE_SECONDS.time("parse_listing"):
+            if self._executor is None:
+                return parse_listing_page(response.text, base_root)
+            return await self._executor.run(parse_listing_page, response.text, base_root)
+
+    async def fetch_pages(
+        self, query: str, max_pages: int, requester: Optional[Requester] = None
+    ) -> AsyncIterator[List[ProductRecord]]:
+        """Yield products page by page, deduplicated by URL, as pages arrive.
+
+        The first page comes from the cache or a shared download and decides
+        how many pages exist; pages 2..N are then requested concurrently under
+        the per-host limit. A failed later page is logged and skipped, a
+        failed first page propagates.
+        """
+        if max_pages <= 1:
+            yield await self.fetch_first_page(query, requester)
+            return
+
+        seen: Set[str] = set()
+
+        def fresh(products: List[ProductRecord]) -> List[ProductRecord]:
+            unique = [item for item in products if item.url not in seen]
+            seen.update(item.url for item in unique)
+            return unique
+
+        first = await self._first_page(query, requester)
+        yield fresh(first.products)
+
+        pages = min(first.page_count, max_pages)
+        tasks = [
+            asyncio.create_task(self._download_page(query, page_number, requester))
+            for page_number in range(2, pages + 1)
+        ]
+        try:
+            for next_page in asyncio.as_completed(tasks):
+                try:
+                    page = await next_page
+                except FETCH_ERRORS as error:
+                    logger.warning("Skipping a result page for %r: %s", query, error)
+                    continue
+                yield fresh(page.products)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+    async def fetch_many(
+        self,
+        queries: Sequence[str],
+        concurrency: int = 5,
+        max_pages: int = 1,
+        on_result: Optional[Callable[[FetchOutcome], Awaitable[None]]] = None,
+        requester: Optional[Requester] = None,
+    ) -> List[FetchOutcome]:
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def fetch(query: str) -> FetchOutcome:
+            products: List[ProductRecord] = []
+            async with semaphore:
+                try:
+                    async for page_products in self.fetch_pages(query, max_pages, requester):
+                        products.extend(page_products)
+                except FETCH_ERRORS as error:
+                    return FetchOutcome(query=query, error=error)
+            return FetchOutcome(query=query, products=products)
+
+        async def run(query: str) -> FetchOutcome:
+            outcome = await fetch(query)
+            if on_result is not None:
+                await on_result(outcome)
+            return outcome
 
-        items: List[Product] = []
-        for raw in raw_products:
-            product = normalize_product(raw, base_root, company_lookup)
-            if product:
-                items.append(product)
-        return items
+        return list(await asyncio.gather(*(run(query) for query in queries)))
@@ -2,10 +2,17 @@ from __future__ import annotations
 
 import json
 import re
+from dataclasses import dataclass, field
 from typing import Dict, Iterable, List, Optional, Tuple
-from urllib.parse import urljoin, urlsplit
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 
-from ..schemas import Product
+from ..schemas import ProductRecord
+from ..utils.metrics import STAGE_SECONDS
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него работает json из stdlib
+    orjson = None
 
 ALLOWED_PRESENCE = {
     "в наличии",
@@ -30,6 +37,8 @@ PRESENCE_CODE_MAP = {
 }
 
 APOLLO_RE = re.compile(r"window.ApolloCacheState = (\{.*?\});", re.S)
+APOLLO_ANCHOR = "ApolloCacheState = {"
+APOLLO_PREFIX = "window"
 LISTING_KEY_PRIORITIES = (
     "CompanyListingQuery",
     "SearchProductsListingQuery",
@@ -56,12 +65,43 @@ def normalize_price_value(price_text: str) -> str:
     return integer_part
 
 
+def find_apollo_state(html: str) -> Optional[str]:
+    """Return the same blob as ``APOLLO_RE`` without running the regex.
+
+    The first ``ApolloCacheState = {`` occurrence is located with ``str.find``
+    and the blob ends at the first ``};`` after it, exactly like the lazy
+    pattern does. Unusual markup falls back to the regex.
+    """
+    anchor = html.find(APOLLO_ANCHOR)
+    if anchor == -1:
+        return None
+    prefix_start = anchor - len(APOLLO_PREFIX) - 1
+    if prefix_start < 0 or not html.startswith(APOLLO_PREFIX, prefix_start):
+        match = APOLLO_RE.search(html)
+        return match.group(1) if match else None
+    start = anchor + len(APOLLO_ANCHOR) - 1
+    end = html.find("};", start + 1)
+    if end == -1:
+        return None
+    return html[start : end + 1]
+
+
+def load_apollo_state(blob: str) -> Dict:
+    if orjson is not None:
+        try:
+            return orjson.loads(blob)
+        except orjson.JSONDecodeError:
+            # orjson строже stdlib (NaN, одиночные суррогаты, большие числа).
+            pass
+    return json.loads(blob)
+
+
 def extract_listing_entry(html: str) -> Dict:
-    match = APOLLO_RE.search(html)
-    if not match:
+    blob = find_apollo_state(html)
+    if blob is None:
         raise ValueError("Не нашли window.ApolloCacheState в HTML")
     try:
-        data = json.loads(match.group(1))
+        data = load_apollo_state(blob)
     except json.JSONDecodeError as error:
         raise ValueError(f"Не удалось разобрать Apollo кэш: {error}") from error
 
@@ -104,7 +144,7 @@ def normalize_product(
     entry: Dict,
     base_root: str,
     company_lookup: Optional[Dict[str, str]] = None,
-) -> Optional[Product]:
+) -> Optional[ProductRecord]:
     product_data = entry.get("product") or {}
 
     presence_title = (entry.get("catalogPresence") or {}).get("title") or (
@@ -169,7 +209,7 @@ def normalize_product(
     manufacturer = ((product_data.get("manufacturerInfo") or {}).get("name") or "").strip()
     product_abs_url = urljoin(base_root, product_url)
 
-    return Product(
+    return ProductRecord(
         url=product_abs_url,
         name=product_data.get("name") or "",
         price=price_value,
@@ -177,3 +217,102 @@ def normalize_product(
         seller=seller,
         manufacturer=manufacturer,
     )
+
+
+@dataclass
+class ListingPage:
+    products: List[ProductRecord] = field(default_factory=list)
+    limit: int = 1
+    total: int = 0
+
+    @property
+    def page_count(self) -> int:
+        if not self.total or not self.limit:
+            return 1
+        return max(1, -(-self.total // self.limit))
+
+
+def build_page_url(base_url: str, page_number: int) -> str:
+    if page_number <= 1:
+        return base_url
+
+    parts = urlsplit(base_url)
+    query_items = parse_qsl(parts.query, keep_blank_values=True)
+    if query_items or "?" in base_url:
+        params = dict(query_items)
+        params["page"] = str(page_number)
+        new_query = urlencode(params, doseq=True)
+        return urlunsplit(
+            (parts.scheme, parts.netloc, parts.path, new_query, parts.fragment)
+        )
+
+    path = parts.path
+    if path.endswith(".html"):
+        base_path = path[:-5]
+        new_path = f"{base_path};{page_number}.html"
+    else:
+        new_path = f"{path};{page_number}"
+    return urlunsplit(
+        (parts.scheme, parts.netloc, new_path, parts.query, parts.fragment)
+    )
+
+
+def parse_listing_page(html: str, base_root: str) -> ListingPage:
+    with STAGE_SECONDS.time("extract_listing_entry"):
+        entry = extract_listing_entry(html)
+    listing = entry["result"]["listing"]
+    page = listing["page"]
+    raw_products = page.get("products") or []
+
+    company_lookup = {}
+    def register_company(comp: dict) -> None:
+        if not isinstance(comp, dict):
+            return
+        identifier = comp.get("id") or comp.get("companyId")
+        if not identifier:
+            return
+        name = (comp.get("name") or comp.get("title") or "").strip()
+        if name:
+            company_lookup[str(identifier)] = name
+
+    def register_container(container) -> None:
+        if isinstance(container, dict):
+            for key, value in container.items():
+                if isinstance(value, dict) and (value.get("id") is None):
+                    value = {**value, "id": value.get("id") or key}
+                register_company(value)
+        elif isinstance(container, list):
+            for comp in container:
+                register_company(comp)
+
+    register_container(page.get("companies"))
+    register_container(page.get("companiesMap"))
+    register_container(listing.get("companies"))
+    register_container(listing.get("companiesMap"))
+
+    items: List[ProductRecord] = []
+    for raw in raw_products:
+        product = normalize_product(raw, base_root, company_lookup)
+        if product:
+            items.append(product)
+
+    variables = entry.get("variables") or {}
+    limit = variables.get("limit") or listing.get("limit") or len(raw_products) or 1
+
+    total = page.get("total")
+    if isinstance(total, dict):
+        total = total.get("count") or total.get("value")
+    total = total or 0
+
+    return ListingPage(
+        products=items,
+        limit=_as_int(limit, default=1) or 1,
+        total=_as_int(total, default=0),
+    )
+
+
+def _as_int(value: object, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
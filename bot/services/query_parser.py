@@ -7,6 +7,10 @@ from typing import List
 DELIMITERS_RE = re.compile(r"[,\.\n;]+")
 
 
+def normalize_query(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
 def split_queries(text: str) -> List[str]:
     candidates = DELIMITERS_RE.split(text)
     cleaned = []
@@ -1,25 +1,194 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, List, Sequence, Tuple
 
 from ..repository import Database
-from ..repository import search_logs
+from ..repository import daily_usage, search_logs
+from .log_writer import BatchWriter, LogRecord, SearchLogWriter
 
 
 @dataclass
-class LimitStatus:
-    allowed: bool
-    remaining: int
+class Reservation:
+    user_id: int
+    day: date
+    granted: int
     used: int
 
 
-async def check_limit(db: Database, user_id: int, capacity: int, requested: int) -> LimitStatus:
-    used = await search_logs.count_requests_today(db, user_id)
-    remaining = max(capacity - used, 0)
-    allowed = requested <= remaining
-    return LimitStatus(allowed=allowed, remaining=remaining, used=used)
+async def reserve(db: Database, user_id: int, capacity: int, requested: int) -> Reservation:
+    granted, used, day = await daily_usage.reserve_queries(db, user_id, capacity, requested)
+    return Reservation(user_id=user_id, day=day, granted=granted, used=used)
 
 
-async def register_queries(db: Database, user_id: int, queries: list[str]) -> None:
-    await search_logs.add_queries(db, user_id, queries)
+async def refund(db: Database, reservation: Reservation, count: int) -> None:
+    count = min(count, reservation.granted)
+    if count <= 0:
+        return
+    await daily_usage.refund_queries(db, reservation.user_id, reservation.day, count)
+    reservation.granted -= count
+    reservation.used -= count
 
+
+@dataclass
+class UsageRecord:
+    user_id: int
+    day: date
+    used: int
+    queries: Sequence[str]
+    created_at: datetime
+
+
+UsageKey = Tuple[int, date]
+
+
+class _UsageWriter(BatchWriter[UsageRecord]):
+    def __init__(
+        self,
+        db: Database,
+        on_flushed: Callable[[Dict[UsageKey, int]], None],
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._db = db
+        self._on_flushed = on_flushed
+
+    async def _write(self, batch: Sequence[UsageRecord]) -> None:
+        usage: Dict[UsageKey, int] = {}
+        logs: List[LogRecord] = []
+        for record in batch:
+            key = (record.user_id, record.day)
+            usage[key] = usage.get(key, 0) + record.used
+            logs.extend((record.user_id, query, record.created_at) for query in record.queries)
+        # Логи и расход лимита пишутся вместе: повтор после сбоя не задвоит ни то, ни другое.
+        async with self._db.transaction() as tx:
+            await search_logs.copy_log_records(tx, logs)
+            await daily_usage.add_usage_batch(
+                tx,
+                [(user_id, day, used) for (user_id, day), used in usage.items() if used],
+            )
+        self._on_flushed(usage)
+
+
+class QuotaTracker:
+    """Per-process daily quota counters with write-behind to Postgres.
+
+    Each user's counter is seeded from ``daily_usage`` on their first message
+    of the UTC day; after that reservations and refunds are purely local and
+    committed usage is flushed in batches by a background writer, in the same
+    transaction as the message's ``search_logs`` rows. With ``local=False``
+    quota is reserved in the database on every call instead, which is
+    required when several bot processes share one quota, and query logs go
+    to the shared :class:`SearchLogWriter`.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        log_writer: SearchLogWriter,
+        local: bool = True,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self._db = db
+        self._log_writer = log_writer
+        self._local = local
+        self._writer = _UsageWriter(
+            db,
+            self._mark_flushed,
+            max_buffer=queue_size,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+        )
+        self._day = _utc_today()
+        self._usage: Dict[int, int] = {}
+        # Использование, уже учтённое локально, но ещё не записанное в daily_usage.
+        self._unflushed: Dict[UsageKey, int] = {}
+        self._seed_locks: Dict[int, asyncio.Lock] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return self._writer.queue_depth
+
+    def start(self) -> None:
+        if self._local:
+            self._writer.start()
+
+    async def close(self) -> None:
+        await self._writer.close()
+
+    async def reserve(self, user_id: int, capacity: int, requested: int) -> Reservation:
+        if not self._local:
+            return await reserve(self._db, user_id, capacity, requested)
+
+        day = self._roll_day()
+        used = await self._seeded_usage(user_id, day)
+        granted = min(max(requested, 0), max(capacity - used, 0))
+        self._usage[user_id] = used + granted
+        return Reservation(user_id=user_id, day=day, granted=granted, used=used + granted)
+
+    async def refund(self, reservation: Reservation, count: int) -> None:
+        if not self._local:
+            await refund(self._db, reservation, count)
+            return
+
+        count = min(count, reservation.granted)
+        if count <= 0:
+            return
+        if reservation.day == self._day and reservation.user_id in self._usage:
+            self._usage[reservation.user_id] = max(self._usage[reservation.user_id] - count, 0)
+        reservation.granted -= count
+        reservation.used -= count
+
+    async def commit(self, reservation: Reservation, queries: Sequence[str]) -> None:
+        if not self._local:
+            await self._log_writer.add(reservation.user_id, queries)
+            return
+
+        used = max(reservation.granted, 0)
+        if not used and not queries:
+            return
+        key = (reservation.user_id, reservation.day)
+        self._unflushed[key] = self._unflushed.get(key, 0) + used
+        await self._writer.put(
+            UsageRecord(
+                reservation.user_id, reservation.day, used, list(queries), datetime.utcnow()
+            )
+        )
+
+    def _mark_flushed(self, usage: Dict[UsageKey, int]) -> None:
+        for key, used in usage.items():
+            left = self._unflushed.get(key, 0) - used
+            if left > 0:
+                self._unflushed[key] = left
+            else:
+                self._unflushed.pop(key, None)
+
+    def _roll_day(self) -> date:
+        today = _utc_today()
+        if today != self._day:
+            self._day = today
+            self._usage.clear()
+            self._seed_locks.clear()
+        return today
+
+    async def _seeded_usage(self, user_id: int, day: date) -> int:
+        used = self._usage.get(user_id)
+        if used is not None:
+            return used
+        lock = self._seed_locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            used = self._usage.get(user_id)
+            if used is None:
+                stored = await daily_usage.get_usage(self._db, user_id, day)
+                used = stored + self._unflushed.get((user_id, day), 0)
+                if self._day == day:
+                    self._usage[user_id] = used
+        return used
+
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from ..utils.metrics import SCHEDULER_WAIT_SECONDS
+
+
+@dataclass(frozen=True)
+class Requester:
+    """Who an outbound request is made for and how much of the capacity they may use."""
+
+    user_id: int
+    weight: float = 1.0
+    max_concurrency: int = 2
+    priority: str = "standard"
+
+
+@dataclass
+class _Waiter:
+    requester: Requester
+    future: asyncio.Future[None]
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+@dataclass
+class SchedulerStats:
+    capacity: int
+    active: int
+    waiting: int
+    users_waiting: int
+
+
+class FairScheduler:
+    """Shares ``capacity`` outbound request slots between users.
+
+    Implements start-time fair queueing. Each user's next request gets a
+    virtual tag of ``max(now_virtual, previous_tag) + 1 / weight``, and free
+    slots go to the smallest tag. A user with weight 4 is therefore served
+    four times as often as a user with weight 1 while both are waiting, and
+    an idle user does not bank credit. On top of that, a user never holds
+    more than ``max_concurrency`` slots, so a burst from one account queues
+    behind its own requests instead of everyone else's.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = max(1, capacity)
+        self._active = 0
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._queues: Dict[int, Deque[_Waiter]] = {}
+        self._running: Dict[int, int] = {}
+        self._last_tag: Dict[int, float] = {}
+        # Пользователи, чья первая заявка уже стоит в куче.
+        self._scheduled: Set[int] = set()
+        self._heap: List[Tuple[float, int, int]] = []
+
+    @property
+    def stats(self) -> SchedulerStats:
+        return SchedulerStats(
+            capacity=self._capacity,
+            active=self._active,
+            waiting=sum(len(queue) for queue in self._queues.values()),
+            users_waiting=len(self._queues),
+        )
+
+    @asynccontextmanager
+    async def slot(self, requester: Requester) -> AsyncIterator[None]:
+        await self._acquire(requester)
+        try:
+            yield
+        finally:
+            self._release(requester.user_id)
+
+    def shared_slot(self) -> "SharedSlot":
+        return SharedSlot(self)
+
+    async def _acquire(self, requester: Requester) -> None:
+        waiter = self._enqueue(requester)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            self._withdraw(waiter)
+            raise
+        SCHEDULER_WAIT_SECONDS.observe(
+            time.perf_counter() - waiter.enqueued_at, requester.priority
+        )
+
+    def _enqueue(self, requester: Requester) -> _Waiter:
+        user_id = requester.user_id
+        waiter = _Waiter(requester, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(user_id, deque()).append(waiter)
+        self._schedule(user_id)
+        self._dispatch()
+        return waiter
+
+    def _withdraw(self, waiter: _Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # Слот уже выдан, но забрать его некому.
+            self._release(waiter.requester.user_id)
+        else:
+            self._discard(waiter)
+
+    def _release(self, user_id: int) -> None:
+        self._active -= 1
+        self._running[user_id] -= 1
+        if not self._running[user_id]:
+            del self._running[user_id]
+        self._schedule(user_id)
+        self._dispatch()
+        self._forget_idle(user_id)
+
+    def _schedule(self, user_id: int) -> None:
+        queue = self._queues.get(user_id)
+        if not queue or user_id in self._scheduled:
+            return
+        requester = queue[0].requester
+        if self._running.get(user_id, 0) >= max(1, requester.max_concurrency):
+            return
+        tag = max(self._virtual_time, self._last_tag.get(user_id, 0.0)) + 1.0 / max(
+            requester.weight, 1e-6
+        )
+        self._last_tag[user_id] = tag
+        self._scheduled.add(user_id)
+        heapq.heappush(self._heap, (tag, next(self._sequence), user_id))
+
+    def _dispatch(self) -> None:
+        while self._active < self._capacity and self._heap:
+            tag, _, user_id = heapq.heappop(self._heap)
+            self._scheduled.discard(user_id)
+            queue = self._queues.get(user_id)
+            # Отменённые ожидания снимаются из очереди позже, в _discard.
+            while queue and queue[0].future.done():
+                queue.popleft()
+            if not queue:
+                self._queues.pop(user_id, None)
+                self._forget_idle(user_id)
+                continue
+            waiter = queue.popleft()
+            if not queue:
+                del self._queues[user_id]
+            self._virtual_time = max(self._virtual_time, tag)
+            self._active += 1
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            waiter.future.set_result(None)
+            self._schedule(user_id)
+
+    def _discard(self, waiter: _Waiter) -> None:
+        user_id = waiter.requester.user_id
+        queue = self._queues.get(user_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            del self._queues[user_id]
+            # Запись в куче останется и будет пропущена в _dispatch.
+        self._forget_idle(user_id)
+
+    def _forget_idle(self, user_id: int) -> None:
+        # Простаивающий пользователь не копит ни долга, ни кредита.
+        if (
+            user_id not in self._queues
+            and user_id not in self._running
+            and user_id not in self._scheduled
+        ):
+            self._last_tag.pop(user_id, None)
+
+
+class SharedSlot:
+    """One scheduler slot requested on behalf of everyone awaiting a shared request.
+
+    Every requester that joins queues its own claim; the claim the
+    scheduler serves first takes the slot and the rest are withdrawn. A
+    shared download is thus charged to whichever waiter's turn comes first,
+    and a joiner is not held behind the backlog of the user who started it.
+    A caller without a requester is not scheduled, so once one joins the
+    slot is entered at once.
+    """
+
+    def __init__(self, scheduler: FairScheduler) -> None:
+        self._scheduler = scheduler
+        self._requesters: List[Requester] = []
+        self._unscheduled = False
+        self._joined = asyncio.Event()
+        self._granted: Optional[_Waiter] = None
+
+    def join(self, requester: Optional[Requester]) -> None:
+        if requester is None:
+            self._unscheduled = True
+        else:
+            self._requesters.append(requester)
+        self._joined.set()
+
+    async def __aenter__(self) -> Optional[Requester]:
+        waiters: List[_Waiter] = []
+        granted: Optional[_Waiter] = None
+        try:
+            while not self._unscheduled:
+                while len(waiters) < len(self._requesters):
+                    waiters.append(self._scheduler._enqueue(self._requesters[len(waiters)]))
+                granted = next((waiter for waiter in waiters if waiter.future.done()), None)
+                if granted is not None:
+                    break
+                self._joined.clear()
+                joined = asyncio.ensure_future(self._joined.wait())
+                try:
+                    await asyncio.wait(
+                        [joined, *(waiter.future for waiter in waiters)],
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                finally:
+                    joined.cancel()
+        except BaseException:
+            for waiter in waiters:
+                self._scheduler._withdraw(waiter)
+            raise
+        for waiter in waiters:
+            if waiter is not granted:
+                self._scheduler._withdraw(waiter)
+        self._granted = granted
+        if granted is None:
+            return None
+        SCHEDULER_WAIT_SECONDS.observe(
+            time.perf_counter() - granted.enqueued_at, granted.requester.priority
+        )
+        return granted.requester
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        if self._granted is not None:
+            self._scheduler._release(self._granted.requester.user_id)
+            self._granted = None
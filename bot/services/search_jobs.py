@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import BufferedInputFile
+
+from ..config import Config
+from ..schemas import QueryResult
+from ..utils.metrics import STAGE_SECONDS
+from ..utils.text import render_excel
+from .executor import CpuExecutor
+from .prom_scraper import FetchOutcome, PromScraper
+from .rate_limit import QuotaTracker, Reservation
+from .scheduler import Requester
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SearchJob:
+    chat_id: int
+    user_id: int
+    queries: List[str]
+    reservation: Reservation
+    max_pages: int = 1
+    requester: Optional[Requester] = None
+    skipped: List[str] = field(default_factory=list)
+    progress_message_id: Optional[int] = None
+
+
+class SearchJobRunner:
+    """Executes queued :class:`SearchJob`s: scrape, render, send the workbook.
+
+    Progress is shown by editing ``progress_message_id`` at most once per
+    ``progress_interval`` seconds. Quota for failed queries is refunded; if
+    the job is interrupted while fetching, so is quota for queries that had
+    not finished yet.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        config: Config,
+        quota: QuotaTracker,
+        scraper: PromScraper,
+        executor: CpuExecutor,
+        progress_interval: float = 2.0,
+    ) -> None:
+        self._bot = bot
+        self._config = config
+        self._quota = quota
+        self._scraper = scraper
+        self._executor = executor
+        self._progress_interval = progress_interval
+
+    async def __call__(self, job: SearchJob) -> None:
+        reservation = job.reservation
+        total = len(job.queries)
+        done = 0
+        fetched: List[str] = []
+        last_edit = time.monotonic()
+        await self._show_progress(job, f"Ищу товары: 0/{total}")
+
+        async def on_result(outcome: FetchOutcome) -> None:
+            nonlocal done, last_edit
+            done += 1
+            if outcome.error is None:
+                fetched.append(outcome.query)
+            now = time.monotonic()
+            if done < total and now - last_edit >= self._progress_interval:
+                last_edit = now
+                await self._show_progress(job, f"Ищу товары: {done}/{total}")
+
+        now = datetime.utcnow()
+        try:
+            with STAGE_SECONDS.time("fetch"):
+                outcomes = await self._scraper.fetch_many(
+                    job.queries,
+                    concurrency=self._config.search_concurrency,
+                    max_pages=job.max_pages,
+                    on_result=on_result,
+                    requester=job.requester,
+                )
+        except BaseException:
+            # Включая отмену при остановке бота: списываем только то, что успели собрать.
+            await self._quota.refund(reservation, reservation.granted - len(fetched))
+            await self._quota.commit(reservation, fetched)
+            raise
+
+        # Неудавшиеся запросы возвращаются в дневной лимит.
+        failed_count = sum(1 for outcome in outcomes if outcome.error is not None)
+        await self._quota.refund(reservation, failed_count)
+
+        results = [
+            QueryResult(query=outcome.query, products=outcome.products, fetched_at=now)
+            for outcome in outcomes
+        ]
+        try:
+            await self._deliver(job, outcomes, results, now)
+        finally:
+            # Что бы ни случилось с отправкой, расход и логи сохраняем, а прогресс убираем.
+            # В журнал, как и при прерывании, попадают только успешные запросы:
+            # неудавшиеся уже возвращены в лимит.
+            await self._quota.commit(
+                reservation, [outcome.query for outcome in outcomes if outcome.error is None]
+            )
+            await self._clear_progress(job)
+
+        if job.skipped:
+            skipped_text = ", ".join(job.skipped)
+            await self._bot.send_message(
+                job.chat_id,
+                f"Лимит на сегодня почти исчерпан. Эти запросы не обработаны: {skipped_text}",
+            )
+
+    async def _deliver(
+        self,
+        job: SearchJob,
+        outcomes: List[FetchOutcome],
+        results: List[QueryResult],
+        now: datetime,
+    ) -> None:
+        for outcome in outcomes:
+            if outcome.error is not None:
+                await self._bot.send_message(
+                    job.chat_id,
+                    f"Не удалось обработать запрос '{outcome.query}': {outcome.error}",
+                )
+
+        if not results:
+            await self._bot.send_message(
+                job.chat_id, "Ничего не удалось собрать. Попробуйте позже."
+            )
+            return
+
+        await self._show_progress(job, "Готовлю Excel-файл…")
+        timestamp = now.strftime("%Y_%m_%d")
+        with STAGE_SECONDS.time("render_excel"):
+            workbook = await self._executor.run(render_excel, results)
+        file = BufferedInputFile(workbook, filename=f"prom_{timestamp}.xlsx")
+        caption = (
+            f"Результаты поиска Prom.ua\n"
+            f"Использовано запросов: {job.reservation.used}/{self._config.daily_query_limit}"
+        )
+        with STAGE_SECONDS.time("send_document"):
+            await self._bot.send_document(job.chat_id, file, caption=caption)
+
+    async def drop(self, job: SearchJob) -> None:
+        """Refund and notify a job that was still queued when the bot stopped."""
+        await self._quota.refund(job.reservation, job.reservation.granted)
+        await self._show_progress(
+            job, "Бот перезапускается, запрос не выполнен. Лимит возвращён, отправьте его ещё раз."
+        )
+
+    async def _show_progress(self, job: SearchJob, text: str) -> None:
+        if job.progress_message_id is None:
+            return
+        try:
+            await self._bot.edit_message_text(
+                text, chat_id=job.chat_id, message_id=job.progress_message_id
+            )
+        except TelegramAPIError as error:
+            logger.debug("Progress update failed for chat %s: %s", job.chat_id, error)
+
+    async def _clear_progress(self, job: SearchJob) -> None:
+        if job.progress_message_id is None:
+            return
+        try:
+            await self._bot.delete_message(job.chat_id, job.progress_message_id)
+        except TelegramAPIError as error:
+            logger.debug("Progress cleanup failed for chat %s: %s", job.chat_id, error)
@@ -1,20 +1,75 @@
 from __future__ import annotations
 
-from typing import Iterable, List, Sequence
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple
 
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound
 from aiogram.types import ChatMember
 
 
-async def check_subscription(bot: Bot, user_id: int, channels: Sequence[str]) -> List[str]:
-    missing: List[str] = []
-    for channel in channels:
-        try:
-            member: ChatMember = await bot.get_chat_member(channel, user_id)
-        except (TelegramForbiddenError, TelegramNotFound, TelegramBadRequest):
-            missing.append(channel)
-            continue
-        if member.status in ("left", "kicked"):
-            missing.append(channel)
-    return missing
+async def _is_member(bot: Bot, channel: str, user_id: int) -> bool:
+    try:
+        member: ChatMember = await bot.get_chat_member(channel, user_id)
+    except (TelegramForbiddenError, TelegramNotFound, TelegramBadRequest):
+        return False
+    return member.status not in ("left", "kicked")
+
+
+class SubscriptionChecker:
+    """Caches channel membership per ``(user_id, channel)``.
+
+    Subscribed users are trusted for ``ttl_seconds``; missing subscriptions are
+    re-checked after ``negative_ttl_seconds`` so a user who has just subscribed
+    is not locked out for long. Only cache misses hit the Telegram API, and
+    they are checked concurrently.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 600.0,
+        negative_ttl_seconds: float = 30.0,
+        max_entries: int = 10000,
+    ) -> None:
+        self._ttl = ttl_seconds
+        self._negative_ttl = negative_ttl_seconds
+        self._max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[bool, float]]" = OrderedDict()
+
+    async def missing_channels(
+        self, bot: Bot, user_id: int, channels: Sequence[str]
+    ) -> List[str]:
+        now = time.monotonic()
+        known: Dict[str, bool] = {}
+        stale: List[str] = []
+        for channel in channels:
+            key = (user_id, channel)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                known[channel] = entry[0]
+                self._entries.move_to_end(key)
+            else:
+                stale.append(channel)
+
+        if stale:
+            statuses = await asyncio.gather(
+                *(_is_member(bot, channel, user_id) for channel in stale)
+            )
+            now = time.monotonic()
+            for channel, subscribed in zip(stale, statuses):
+                known[channel] = subscribed
+                self._remember((user_id, channel), subscribed, now)
+
+        return [channel for channel in channels if not known[channel]]
+
+    def _remember(self, key: Tuple[int, str], subscribed: bool, now: float) -> None:
+        ttl = self._ttl if subscribed else self._negative_ttl
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (subscribed, now + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
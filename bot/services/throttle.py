@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # Экспоненциальная задержка с полным джиттером.
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """Asyncio token bucket: ``rate`` tokens per second, up to ``burst`` at once.
+
+    Kept free of bot dependencies so standalone scripts such as ``on.py`` can
+    share it.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._rate = float(rate)
+        self._burst = max(1, int(burst))
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # Лок выстраивает ожидающих в очередь, чтобы токены выдавались по порядку.
+        async with self._lock:
+            await self._take()
+
+    async def _take(self) -> None:
+        self._refill()
+        while self._tokens < 1:
+            await asyncio.sleep((1 - self._tokens) / self._rate)
+            self._refill()
+        self._tokens -= 1
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """Token bucket whose rate follows the upstream's tolerance (AIMD).
+
+    Every successful response raises the rate by ``increase`` up to
+    ``max_rate``; a throttling response (429/503) multiplies it by
+    ``decrease_factor`` down to ``min_rate``, drops the saved burst and, when
+    the server sent ``Retry-After``, pauses all acquisitions until then.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        burst: int = 1,
+        increase: float = 0.1,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        if min_rate <= 0:
+            raise ValueError("min_rate must be positive")
+        self._min_rate = float(min_rate)
+        self._max_rate = max(float(max_rate), self._min_rate)
+        super().__init__(min(max(rate, self._min_rate), self._max_rate), burst)
+        self._increase = increase
+        self._decrease_factor = decrease_factor
+        self._paused_until = 0.0
+
+    @property
+    def paused_for(self) -> float:
+        return max(self._paused_until - time.monotonic(), 0.0)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0:
+                    break
+                await asyncio.sleep(pause)
+            await self._take()
+
+    def on_success(self) -> None:
+        self._refill()
+        self._rate = min(self._max_rate, self._rate + self._increase)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        self._refill()
+        self._rate = max(self._min_rate, self._rate * self._decrease_factor)
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open, :meth:`allow` refuses calls for ``reset_timeout`` seconds;
+    after that a single probe is let through (half-open) and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self._failure_threshold = max(1, failure_threshold)
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        now = time.monotonic()
+        # Пробный запрос, который так и не завершился, не должен держать цепь открытой.
+        if state == "half_open" and (
+            self._probe_started is None or now - self._probe_started >= self._reset_timeout
+        ):
+            self._probe_started = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._opened_at is None:
+            if self._failures >= self._failure_threshold:
+                self._opened_at = time.monotonic()
+        elif self._probe_started is not None:
+            # Неудачная проба снова размыкает цепь. Запросы, начатые до размыкания,
+            # могут падать и позже: они не должны отодвигать следующую пробу.
+            self._opened_at = time.monotonic()
+            self._probe_started = None
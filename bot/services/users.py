@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Optional
+
+from aiogram.types import User as TelegramUser
+
+from ..repository import Database
+from ..repository.users import ensure_user
+
+
+class UserRegistry:
+    """Registers users in the ``users`` table once per process.
+
+    The upsert is skipped while the process remembers the same
+    ``(id, username)``, so a regular message costs no extra round-trip; a
+    changed username is written again. Remembered users are kept in an LRU
+    of ``max_entries``.
+    """
+
+    def __init__(self, db: Database, max_entries: int = 100000) -> None:
+        self._db = db
+        self._max_entries = max(1, max_entries)
+        self._known: "OrderedDict[int, Optional[str]]" = OrderedDict()
+
+    async def ensure(self, user: TelegramUser) -> None:
+        if user.id in self._known and self._known[user.id] == user.username:
+            self._known.move_to_end(user.id)
+            return
+        await ensure_user(self._db, user)
+        self._known[user.id] = user.username
+        self._known.move_to_end(user.id)
+        while len(self._known) > self._max_entries:
+            self._known.popitem(last=False)
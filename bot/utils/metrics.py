@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value)
+
+
+class Registry:
+    """Collects metrics and renders them in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        registry: Optional[Registry] = REGISTRY,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self._label_names = tuple(labels)
+        # Запись идёт и из потоков CpuExecutor, поэтому изменения под локом.
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        """Sample lines of this metric in the text exposition format."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self._label_names, labels)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """A value that is either set directly or read from ``callback`` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], float]] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def set_callback(self, callback: Callable[[], float]) -> None:
+        self._callback = callback
+
+    def samples(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                return [f"{self.name} {_format_value(float(self._callback()))}"]
+            except Exception:  # noqa: BLE001 - метрика не должна ронять /metrics
+                logger.exception("Gauge %s callback failed", self.name)
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self._label_names, labels)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_started")
+
+    def __init__(self, histogram: Histogram, labels: LabelValues) -> None:
+        self._histogram = histogram
+        self._labels = labels
+        self._started = 0.0
+
+    def __enter__(self) -> _Timer:
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._histogram.observe(time.perf_counter() - self._started, *self._labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._bounds = tuple(sorted(buckets))
+        # Для каждого набора меток: счётчики корзин (последняя — +Inf), сумма, количество.
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self._bounds) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def time(self, *labels: str) -> _Timer:
+        return _Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (labels, (list(counts), total[0]))
+                for labels, (counts, total) in self._series.items()
+            )
+        lines: List[str] = []
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self._bounds + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self._label_names, labels, le)} {cumulative}"
+                )
+            label_text = _format_labels(self._label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "bot_stage_seconds",
+    "Time spent in each stage of handling a search message",
+    labels=("stage",),
+)
+PROM_RESPONSES = Counter(
+    "bot_prom_responses_total",
+    "Responses from Prom.ua by HTTP status (or 'error' for network failures)",
+    labels=("status",),
+)
+CACHE_LOOKUPS = Counter(
+    "bot_cache_lookups_total",
+    "Search cache lookups by tier and result",
+    labels=("tier", "result"),
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "bot_db_pool_wait_seconds",
+    "Time spent waiting for a Postgres connection from the pool",
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "bot_event_loop_lag_seconds",
+    "How late the event loop wakes up a sleeping task",
+)
+CPU_QUEUE_DEPTH = Gauge(
+    "bot_cpu_executor_queue_depth",
+    "Jobs running or waiting in the CPU executor",
+)
+DB_POOL_SIZE = Gauge("bot_db_pool_size", "Open connections in the Postgres pool")
+DB_POOL_IDLE = Gauge("bot_db_pool_idle", "Idle connections in the Postgres pool")
+SEARCH_LOG_QUEUE_DEPTH = Gauge(
+    "bot_search_log_queue_depth",
+    "search_logs rows waiting to be written",
+)
+QUOTA_QUEUE_DEPTH = Gauge(
+    "bot_quota_queue_depth",
+    "Quota usage updates waiting to be written",
+)
+UPDATES_IN_FLIGHT = Gauge(
+    "bot_updates_in_flight",
+    "Telegram updates being handled or waiting for a worker",
+)
+SEARCH_JOBS_PENDING = Gauge(
+    "bot_search_jobs_pending",
+    "Search jobs waiting in the queue",
+)
+SEARCH_JOBS_RUNNING = Gauge(
+    "bot_search_jobs_running",
+    "Search jobs being processed by workers",
+)
+SCHEDULER_WAIT_SECONDS = Histogram(
+    "bot_scheduler_wait_seconds",
+    "Time a Prom.ua request waited for a fair-scheduler slot",
+    labels=("priority",),
+)
+SCHEDULER_WAITING = Gauge(
+    "bot_scheduler_waiting",
+    "Prom.ua requests waiting for a fair-scheduler slot",
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total",
+    "Unhandled exceptions in update handlers by exception type",
+    labels=("exception",),
+)
+
+
+class LoopLagMonitor:
+    """Sleeps for ``interval`` seconds in a loop and records how late it wakes up."""
+
+    def __init__(self, interval: float = 0.5) -> None:
+        self._interval = interval
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self._interval)
+            EVENT_LOOP_LAG_SECONDS.observe(max(loop.time() - started - self._interval, 0.0))
+
+
+async def metrics_view(_: web.Request) -> web.Response:
+    from aiohttp import web
+
+    return web.Response(text=REGISTRY.render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    # aiohttp импортируется лениво: модуль метрик грузится и в процессах CpuExecutor.
+    from aiohttp import web
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_view)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics available at http://%s:%d/metrics", host, port)
+    return runner
@@ -1,14 +1,14 @@
 from __future__ import annotations
 
 from io import BytesIO
-from typing import Iterable, List
+from typing import Iterable, Iterator, List
 
 from openpyxl import Workbook
 
-from ..schemas import SearchResult
+from ..schemas import QueryResult
 
 
-def render_text(results: Iterable[SearchResult]) -> str:
+def render_text(results: Iterable[QueryResult]) -> str:
     lines: List[str] = []
     for result in results:
         lines.append(f"Поиск: {result.query}")
@@ -22,37 +22,42 @@ def render_text(results: Iterable[SearchResult]) -> str:
     return "\n".join(lines)
 
 
-def render_excel(results: Iterable[SearchResult]) -> BytesIO:
-    workbook = Workbook()
-    sheet = workbook.active
-    sheet.title = "Prom Search"
-    sheet.append(
-        [
-            "Запрос",
-            "№ позиции",
-            "Название позиции",
-            "Цена",
-            "Статус",
-            "Продавець",
-            "Бренд",
-            "Ссылка на товар",
-        ]
-    )
+EXCEL_HEADER = (
+    "Запрос",
+    "№ позиции",
+    "Название позиции",
+    "Цена",
+    "Статус",
+    "Продавець",
+    "Бренд",
+    "Ссылка на товар",
+)
+
+
+def iter_excel_rows(results: Iterable[QueryResult]) -> Iterator[tuple]:
     for result in results:
         for idx, product in enumerate(result.products, start=1):
-            sheet.append(
-                [
-                    result.query,
-                    idx,
-                    product.name,
-                    product.price,
-                    product.presence,
-                    product.seller,
-                    product.manufacturer,
-                    product.url,
-                ]
+            yield (
+                result.query,
+                idx,
+                product.name,
+                product.price,
+                product.presence,
+                product.seller,
+                product.manufacturer,
+                product.url,
             )
+
+
+def render_excel(results: Iterable[QueryResult]) -> bytes:
+    # write_only-книга сбрасывает строки во временный файл по мере добавления,
+    # поэтому память не растёт вместе с числом строк.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Prom Search")
+    sheet.append(EXCEL_HEADER)
+    for row in iter_excel_rows(results):
+        sheet.append(row)
     buffer = BytesIO()
     workbook.save(buffer)
-    buffer.seek(0)
-    return buffer
+    # getvalue() отдаёт внутренний bytes буфера без копирования.
+    return buffer.getvalue()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+from .config import Config
+from .repository import Database
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+
+
+class InFlightTracker(BaseMiddleware):
+    """Outer update middleware that counts updates in flight.
+
+    Shutdown uses it to wait for handlers that already started. It does not
+    limit concurrency: polling is bounded by ``tasks_concurrency_limit`` and
+    the webhook by :class:`BoundedRequestHandler`. Queued searches are drained
+    separately by ``FairJobQueue.close``.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def __call__(
+        self, handler: Handler, event: TelegramObject, data: Dict[str, Any]
+    ) -> Any:
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown timed out with %d updates still in flight", self._in_flight)
+            return False
+        return True
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """Webhook handler that runs at most ``workers`` updates in the background.
+
+    The slot is taken before the task is created, so the response to Telegram
+    is delayed instead of piling up tasks; Telegram then holds back further
+    updates on that connection. Closing does not touch the bot session: the
+    application closes it once the search queue has drained.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, workers: int, **kwargs: Any) -> None:
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self._slots = asyncio.Semaphore(max(1, workers))
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    def _task_done(self, task: asyncio.Task[Any]) -> None:
+        self._background_feed_update_tasks.discard(task)
+        self._slots.release()
+
+    async def close(self) -> None:
+        pass
+
+
+def _stop_on_signals(stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: остаётся KeyboardInterrupt по Ctrl+C.
+            pass
+
+
+async def run_webhook(
+    bot: Bot, dp: Dispatcher, config: Config, db: Database, tracker: InFlightTracker
+) -> None:
+    """Serve Telegram updates over a webhook until SIGINT/SIGTERM.
+
+    ``/healthz`` answers while the process is alive; ``/readyz`` answers 200
+    only after the webhook is registered, while Postgres responds and until
+    shutdown begins, so a load balancer stops routing to a draining replica.
+    """
+    if not config.webhook_url:
+        raise RuntimeError("WEBHOOK_URL is required when RUN_MODE=webhook")
+    ready = False
+
+    async def healthz(_: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "in_flight": tracker.in_flight})
+
+    async def readyz(_: web.Request) -> web.Response:
+        if not ready:
+            return web.json_response({"status": "not ready"}, status=503)
+        try:
+            await asyncio.wait_for(db.fetchval("SELECT 1"), timeout=1.0)
+        except Exception as error:  # noqa: BLE001 - любая ошибка значит «не готов»
+            return web.json_response(
+                {"status": "database unavailable", "error": str(error)}, status=503
+            )
+        return web.json_response({"status": "ready"})
+
+    app = web.Application()
+    BoundedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        workers=config.update_workers,
+        secret_token=config.webhook_secret or None,
+    ).register(app, path=config.webhook_path)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/readyz", readyz)
+
+    stop = asyncio.Event()
+    _stop_on_signals(stop)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, config.webhook_host, config.webhook_port)
+    await site.start()
+    try:
+        await bot.set_webhook(
+            config.webhook_url.rstrip("/") + config.webhook_path,
+            secret_token=config.webhook_secret or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=config.webhook_max_connections,
+        )
+        ready = True
+        logger.info(
+            "Webhook server listening on %s:%d%s",
+            config.webhook_host,
+            config.webhook_port,
+            config.webhook_path,
+        )
+        await stop.wait()
+    finally:
+        # Вебхук не снимаем: другие реплики продолжают принимать обновления.
+        ready = False
+        await asyncio.sleep(config.webhook_drain_delay)
+        await site.stop()
+        await tracker.drain(config.shutdown_timeout)
+        await runner.cleanup()
@@ -1,26 +1,66 @@
+from __future__ import annotations
+
 import argparse
+import asyncio
 import csv
 import json
 import math
 import random
 import re
+import sqlite3
 import time
+from collections import deque
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
 from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 
 import requests
 
+if TYPE_CHECKING:
+    # Нужны только асинхронному режиму (--async) и импортируются там же.
+    import httpx
+
+    from bot.services.throttle import TokenBucket
+
 # Парсер по ссылке на категорию
 # Можно указать строку с одним URL или перечисление нескольких URL.
 DEFAULT_START_URLS: Union[str, Iterable[str]] = (
     "https://prom.ua/c3825812-riverwood-internet-magazin.html"
 )
 OUTPUT_CSV = "Столовая_посуда.csv"
+CSV_HEADER = ["idx", "url", "name", "bought", "price", "presence", "manufacturer"]
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+SEEN_SUFFIX = ".seen"
+DEFAULT_MANUFACTURER_CACHE = "manufacturers_cache.sqlite"
+DEFAULT_MANUFACTURER_TTL = 30 * 24 * 3600
+DEFAULT_MANUFACTURER_NEGATIVE_TTL = 3 * 24 * 3600
 DEFAULT_MAX_PAGES = 0
 DEFAULT_LISTING_DELAY_RANGE = (0.5, 1.5)
 DEFAULT_PRODUCT_DELAY_RANGE = (0.1, 0.3)
 RETRY_ATTEMPTS = 3
+DEFAULT_ASYNC_CONCURRENCY = 8
+DEFAULT_ASYNC_RATE = 3.0
+RETRY_BACKOFF_BASE = 1.0
+RETRY_BACKOFF_MAX = 30.0
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "ru,uk;q=0.8,en;q=0.6",
+}
 ALLOWED_PRESENCE = {
     "в наличии",
     "готов к отправке",
@@ -203,15 +243,21 @@ def normalize_product(raw: Dict) -> Optional[Dict[str, str]]:
     }
 
 
-def extract_manufacturer_from_product_page(html: str) -> str:
+def extract_manufacturer_from_product_page(html: str) -> Optional[str]:
+    """Производитель с карточки товара; "" — карточка без производителя.
+
+    None, если в ответе нет данных товара (капча, страница антибота и т. п.):
+    такой результат нельзя кэшировать как «производителя нет».
+    """
     try:
         match = APOLLO_RE.search(html)
         if not match:
-            return ""
+            return None
         data = json.loads(match.group(1))
     except (json.JSONDecodeError, ValueError):
-        return ""
+        return None
 
+    found = False
     fast_cache = data.get("_FAST_CACHE") or {}
     for value in fast_cache.values():
         if not isinstance(value, dict):
@@ -219,16 +265,73 @@ def extract_manufacturer_from_product_page(html: str) -> str:
         product = (value.get("result") or {}).get("product")
         if not isinstance(product, dict):
             continue
+        found = True
         manufacturer = (
             (product.get("manufacturerInfo") or {}).get("name") or ""
         ).strip()
         if manufacturer:
             return manufacturer
-    return ""
+    return "" if found else None
+
+
+class ManufacturerCache:
+    """Постоянный кэш производителей по URL товара (SQLite), общий для запусков.
+
+    Пустой производитель тоже кэшируется, но на более короткий срок
+    (negative_ttl), чтобы карточки без бренда не запрашивались каждый раз.
+    Ошибки загрузки и ответы без данных товара не кэшируются.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        ttl: float = DEFAULT_MANUFACTURER_TTL,
+        negative_ttl: float = DEFAULT_MANUFACTURER_NEGATIVE_TTL,
+    ) -> None:
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._conn = sqlite3.connect(str(path) if path else ":memory:")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS manufacturers (
+                url TEXT PRIMARY KEY,
+                manufacturer TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT manufacturer, fetched_at FROM manufacturers WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        manufacturer, fetched_at = row
+        ttl = self._ttl if manufacturer else self._negative_ttl
+        if fetched_at + ttl <= time.time():
+            return None
+        return manufacturer
+
+    def put(self, url: str, manufacturer: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO manufacturers (url, manufacturer, fetched_at) VALUES (?, ?, ?)",
+            (url, manufacturer, time.time()),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
 
 
 def fill_missing_manufacturers(
-    session: requests.Session, products: List[Dict[str, str]], base_url: str
+    session: requests.Session,
+    products: List[Dict[str, str]],
+    base_url: str,
+    manufacturer_cache: Optional[ManufacturerCache] = None,
 ) -> None:
     if not products:
         return
@@ -247,6 +350,12 @@ def fill_missing_manufacturers(
         if absolute_url in cache:
             item["manufacturer"] = cache[absolute_url]
             continue
+        if manufacturer_cache is not None:
+            cached = manufacturer_cache.get(absolute_url)
+            if cached is not None:
+                cache[absolute_url] = cached
+                item["manufacturer"] = cached
+                continue
 
         try:
             sleep_between_requests(DEFAULT_PRODUCT_DELAY_RANGE)
@@ -257,9 +366,12 @@ def fill_missing_manufacturers(
             cache[absolute_url] = ""
             continue
 
-        manufacturer = extract_manufacturer_from_product_page(resp.text) or ""
+        parsed = extract_manufacturer_from_product_page(resp.text)
+        manufacturer = parsed or ""
         cache[absolute_url] = manufacturer
         item["manufacturer"] = manufacturer
+        if manufacturer_cache is not None and parsed is not None:
+            manufacturer_cache.put(absolute_url, manufacturer)
 
 
 def parse_products(html: str) -> Dict[str, Iterable[Dict[str, str]]]:
@@ -283,9 +395,231 @@ def parse_products(html: str) -> Dict[str, Iterable[Dict[str, str]]]:
     }
 
 
-def gather_all_products(
-    session: requests.Session, start_url: str, max_pages: Optional[int] = None
-) -> List[Dict[str, str]]:
+def page_count(parsed: Dict[str, Iterable[Dict[str, str]]]) -> int:
+    limit = parsed["limit"]
+    total = parsed["total"]
+    pages = 1
+    if total and limit:
+        pages = max(1, math.ceil(total / limit))
+    return pages
+
+
+def normalize_page(raw_products: Iterable[Dict], base_root: str) -> List[Dict[str, str]]:
+    items: List[Dict[str, str]] = []
+    for raw in raw_products:
+        item = normalize_product(raw)
+        if not item:
+            continue
+        url = urljoin(base_root, item["url"])
+        if not url:
+            continue
+        item["url"] = url
+        items.append(item)
+    return items
+
+
+class CrawlCheckpoint:
+    """Состояние обхода для продолжения после сбоя (--resume).
+
+    Хранит готовые страницы по каждому стартовому URL, число строк в CSV и
+    страницу, для которой ещё ищутся производители. Ссылки уже записанных
+    товаров не переписываются целиком при каждом сохранении, а дописываются
+    в соседний файл ``<checkpoint>.seen`` по одной на строку.
+    Без пути работает только в памяти.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        self.rows_written = 0
+        self.seen: set = set()
+        self.urls: Dict[str, Dict] = {}
+        self.pending: Optional[Dict] = None
+        self._resumed = False
+        self._seen_fh: Optional[TextIO] = None
+
+    @property
+    def seen_path(self) -> Optional[Path]:
+        return self.path.with_name(self.path.name + SEEN_SUFFIX) if self.path else None
+
+    @classmethod
+    def load(cls, path: Path) -> "CrawlCheckpoint":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        checkpoint = cls(path)
+        checkpoint._resumed = True
+        checkpoint.rows_written = int(data.get("rows_written") or 0)
+        # "seen" внутри JSON — формат контрольных точек прежних версий.
+        stored = set(checkpoint._read_seen())
+        checkpoint.seen = stored | set(data.get("seen") or [])
+        checkpoint.urls = data.get("urls") or {}
+        for state in checkpoint.urls.values():
+            state["completed"] = set(state.get("completed") or [])
+        checkpoint.pending = data.get("pending")
+        if checkpoint.pending:
+            # Ссылки этой страницы могли не успеть попасть в .seen до сбоя.
+            missing = [
+                item["url"]
+                for item in checkpoint.pending["items"]
+                if item.get("url") and item["url"] not in stored
+            ]
+            checkpoint.seen.update(missing)
+            checkpoint._append_seen(missing)
+        return checkpoint
+
+    def _read_seen(self) -> List[str]:
+        seen_path = self.seen_path
+        if seen_path is None or not seen_path.exists():
+            return []
+        raw = seen_path.read_bytes()
+        complete = raw.rfind(b"\n") + 1
+        if complete < len(raw):
+            # Последняя строка оборвана сбоем: отрезаем её, чтобы дописывать с новой строки.
+            with seen_path.open("r+b") as fh:
+                fh.truncate(complete)
+        return [line for line in raw[:complete].decode("utf-8").split("\n") if line]
+
+    def _append_seen(self, urls: List[str]) -> None:
+        if not self.path or not urls:
+            return
+        self._open_seen()
+        assert self._seen_fh is not None
+        self._seen_fh.write("".join(f"{url}\n" for url in urls))
+        self._seen_fh.flush()
+
+    def _open_seen(self) -> None:
+        seen_path = self.seen_path
+        if self._seen_fh is None and seen_path is not None:
+            # Новый обход начинает файл заново, продолжение дописывает в него.
+            mode = "a" if self._resumed else "w"
+            self._seen_fh = seen_path.open(mode, encoding="utf-8")
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        # Открываем .seen до записи JSON, чтобы новый обход не подхватил ссылки прошлого.
+        self._open_seen()
+        data = {
+            "rows_written": self.rows_written,
+            "urls": {
+                url: {**state, "completed": sorted(state["completed"])}
+                for url, state in self.urls.items()
+            },
+            "pending": self.pending,
+        }
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def close(self) -> None:
+        if self._seen_fh is not None:
+            self._seen_fh.close()
+            self._seen_fh = None
+
+    def remove(self) -> None:
+        self.close()
+        for path in (self.path, self.seen_path):
+            if path and path.exists():
+                path.unlink()
+
+    def _url_state(self, start_url: str) -> Dict:
+        return self.urls.setdefault(
+            start_url, {"pages": None, "completed": set(), "done": False}
+        )
+
+    def known_pages(self, start_url: str) -> Optional[int]:
+        return self._url_state(start_url)["pages"]
+
+    def set_pages(self, start_url: str, pages: int) -> None:
+        self._url_state(start_url)["pages"] = pages
+
+    def is_page_done(self, start_url: str, page_number: int) -> bool:
+        return page_number in self._url_state(start_url)["completed"]
+
+    def is_url_done(self, start_url: str) -> bool:
+        return bool(self._url_state(start_url)["done"])
+
+    def take_new(self, items: Iterable[Dict[str, str]]) -> List[Dict[str, str]]:
+        fresh: List[Dict[str, str]] = []
+        for item in items:
+            product_url = item.get("url", "")
+            if product_url and product_url in self.seen:
+                continue
+            if product_url:
+                self.seen.add(product_url)
+            fresh.append(item)
+        return fresh
+
+    def begin_page(self, start_url: str, page_number: int, items: List[Dict[str, str]]) -> None:
+        self.pending = {"url": start_url, "page": page_number, "items": items}
+        self.save()
+        self._append_seen([item["url"] for item in items if item.get("url")])
+
+    def complete_page(self, start_url: str, page_number: int, rows_written: int) -> None:
+        self.pending = None
+        self.rows_written = rows_written
+        self._url_state(start_url)["completed"].add(page_number)
+        self.save()
+
+    def finish_url(self, start_url: str) -> None:
+        self._url_state(start_url)["done"] = True
+        self.save()
+
+
+class CsvAppender:
+    """Дописывает строки в CSV по мере обхода, сохраняя сквозную нумерацию."""
+
+    def __init__(self, path: Path, keep_rows: int = 0) -> None:
+        self.path = path
+        self.rows_written = 0
+        if keep_rows and path.exists():
+            self._truncate(keep_rows)
+            self._fh = path.open("a", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._fh)
+        else:
+            self._fh = path.open("w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._fh)
+            self._writer.writerow(CSV_HEADER)
+            self._fh.flush()
+
+    def _truncate(self, keep_rows: int) -> None:
+        # При продолжении отбрасываем строки, записанные после последней контрольной точки.
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with self.path.open(newline="", encoding="utf-8") as src, tmp_path.open(
+            "w", newline="", encoding="utf-8"
+        ) as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst)
+            writer.writerow(next(reader, CSV_HEADER))
+            for row in reader:
+                if self.rows_written >= keep_rows:
+                    break
+                writer.writerow(row)
+                self.rows_written += 1
+        tmp_path.replace(self.path)
+
+    def write(self, rows: Iterable[Dict[str, str]]) -> None:
+        for row in rows:
+            self.rows_written += 1
+            self._writer.writerow(csv_row(self.rows_written, row))
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def store_page(
+    checkpoint: CrawlCheckpoint,
+    sink: CsvAppender,
+    start_url: str,
+    page_number: int,
+    items: List[Dict[str, str]],
+) -> None:
+    sink.write(items)
+    checkpoint.complete_page(start_url, page_number, sink.rows_written)
+
+
+def fetch_first_page(
+    session: requests.Session, start_url: str
+) -> Dict[str, Iterable[Dict[str, str]]]:
     parsed: Optional[Dict[str, Iterable[Dict[str, str]]]] = None
     last_error: Optional[ValueError] = None
 
@@ -306,37 +640,28 @@ def gather_all_products(
 
     if parsed is None:
         raise last_error or ValueError("Не удалось разобрать первую страницу")
-
-    limit = parsed["limit"]
-    total = parsed["total"]
-    pages = 1
-    if total and limit:
-        pages = max(1, math.ceil(total / limit))
+    return parsed
+
+
+def iter_listing_pages(
+    session: requests.Session,
+    start_url: str,
+    checkpoint: CrawlCheckpoint,
+    max_pages: Optional[int] = None,
+) -> Iterator[Tuple[int, Iterable[Dict]]]:
+    pages = checkpoint.known_pages(start_url)
+    if pages is None or not checkpoint.is_page_done(start_url, 1):
+        parsed = fetch_first_page(session, start_url)
+        pages = page_count(parsed)
+        checkpoint.set_pages(start_url, pages)
+        yield 1, parsed["products"]
 
     if max_pages:
         pages = min(pages, max_pages)
 
-    parts = urlsplit(start_url)
-    base_root = f"{parts.scheme}://{parts.netloc}"
-
-    seen = set()
-    collected: List[Dict[str, str]] = []
-
-    def consume(raw_products: Iterable[Dict]):
-        for raw in raw_products:
-            item = normalize_product(raw)
-            if not item:
-                continue
-            url = urljoin(base_root, item["url"])
-            if not url or url in seen:
-                continue
-            seen.add(url)
-            item["url"] = url
-            collected.append(item)
-
-    consume(parsed["products"])
-
     for page_number in range(2, pages + 1):
+        if checkpoint.is_page_done(start_url, page_number):
+            continue
         page_url = build_page_url(start_url, page_number)
         stop_pagination = False
         skip_page = False
@@ -373,29 +698,304 @@ def gather_all_products(
             continue
         if not parsed_page["products"]:
             break
-        consume(parsed_page["products"])
+        yield page_number, parsed_page["products"]
 
-    return collected
 
+def crawl_sync(
+    urls: List[str],
+    max_pages: Optional[int],
+    checkpoint: CrawlCheckpoint,
+    sink: CsvAppender,
+    manufacturer_cache: Optional[ManufacturerCache] = None,
+) -> None:
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
 
-def write_csv(rows: Iterable[Dict[str, str]], path: Path) -> None:
-    with path.open("w", newline="", encoding="utf-8") as fh:
-        writer = csv.writer(fh)
-        writer.writerow(
-            ["idx", "url", "name", "bought", "price", "presence", "manufacturer"]
+    if checkpoint.pending:
+        pending = checkpoint.pending
+        fill_missing_manufacturers(
+            session, pending["items"], pending["url"], manufacturer_cache
         )
-        for idx, row in enumerate(rows, start=1):
-            writer.writerow(
-                [
-                    idx,
-                    row.get("url", ""),
-                    row.get("name", ""),
-                    row.get("bought", ""),
-                    row.get("price", ""),
-                    row.get("presence", ""),
-                    row.get("manufacturer", ""),
-                ]
+        store_page(checkpoint, sink, pending["url"], pending["page"], pending["items"])
+
+    for url in urls:
+        if checkpoint.is_url_done(url):
+            continue
+        parts = urlsplit(url)
+        base_root = f"{parts.scheme}://{parts.netloc}"
+        try:
+            for page_number, raw_products in iter_listing_pages(
+                session, url, checkpoint, max_pages=max_pages
+            ):
+                items = checkpoint.take_new(normalize_page(raw_products, base_root))
+                checkpoint.begin_page(url, page_number, items)
+                fill_missing_manufacturers(session, items, url, manufacturer_cache)
+                store_page(checkpoint, sink, url, page_number, items)
+        except requests.RequestException as error:
+            print(f"Не удалось собрать товары для {url}: {error}")
+            continue
+        except ValueError as error:
+            print(f"Ошибка при обработке {url}: {error}")
+            continue
+        checkpoint.finish_url(url)
+
+
+def backoff_delay(attempt: int) -> float:
+    from bot.services.throttle import backoff_delay as jittered_backoff
+
+    return jittered_backoff(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX)
+
+
+async def fetch_async(
+    client: httpx.AsyncClient, url: str, bucket: TokenBucket
+) -> httpx.Response:
+    """GET с ограничением частоты и повторами при сетевых ошибках, 429 и 5xx.
+
+    Возвращает последний ответ, даже если он неуспешный: решение о пропуске
+    страницы принимает вызывающий код, как и в синхронном режиме.
+    """
+    import httpx
+
+    for attempt in range(RETRY_ATTEMPTS):
+        await bucket.acquire()
+        try:
+            resp = await client.get(url)
+        except httpx.TransportError:
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        if resp.status_code in RETRYABLE_STATUSES and attempt < RETRY_ATTEMPTS - 1:
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        return resp
+    raise RuntimeError("unreachable")
+
+
+async def fetch_listing_page_async(
+    client: httpx.AsyncClient, page_url: str, page_number: int, bucket: TokenBucket
+) -> Tuple[str, Optional[Dict[str, Iterable[Dict[str, str]]]]]:
+    for attempt in range(RETRY_ATTEMPTS):
+        resp = await fetch_async(client, page_url, bucket)
+        if resp.status_code in (404, 410):
+            return "stop", None
+        if resp.status_code >= 500:
+            print(f"Пропускаем страницу {page_number}: {resp.status_code}")
+            return "skip", None
+        resp.raise_for_status()
+        try:
+            return "ok", parse_products(resp.text)
+        except ValueError as error:
+            if attempt < RETRY_ATTEMPTS - 1:
+                print(f"Повтор запроса страницы {page_number} для {page_url}: {error}")
+                continue
+            print(f"Пропускаем страницу {page_number}: {error}")
+    return "skip", None
+
+
+async def fetch_first_page_async(
+    client: httpx.AsyncClient, start_url: str, bucket: TokenBucket
+) -> Dict[str, Iterable[Dict[str, str]]]:
+    for attempt in range(RETRY_ATTEMPTS):
+        first_resp = await fetch_async(client, start_url, bucket)
+        first_resp.raise_for_status()
+        try:
+            return parse_products(first_resp.text)
+        except ValueError as error:
+            if attempt < RETRY_ATTEMPTS - 1:
+                print(f"Повтор запроса {start_url}: {error}")
+                continue
+            raise error
+    raise ValueError("Не удалось разобрать первую страницу")
+
+
+async def iter_listing_pages_async(
+    client: httpx.AsyncClient,
+    start_url: str,
+    checkpoint: CrawlCheckpoint,
+    bucket: TokenBucket,
+    concurrency: int,
+    max_pages: Optional[int] = None,
+) -> AsyncIterator[Tuple[int, Iterable[Dict]]]:
+    pages = checkpoint.known_pages(start_url)
+    if pages is None or not checkpoint.is_page_done(start_url, 1):
+        parsed = await fetch_first_page_async(client, start_url, bucket)
+        pages = page_count(parsed)
+        checkpoint.set_pages(start_url, pages)
+        yield 1, parsed["products"]
+
+    if max_pages:
+        pages = min(pages, max_pages)
+
+    remaining = deque(
+        number
+        for number in range(2, pages + 1)
+        if not checkpoint.is_page_done(start_url, number)
+    )
+    window: Deque[Tuple[int, "asyncio.Task"]] = deque()
+
+    def refill() -> None:
+        # Качаем не больше concurrency страниц наперёд, чтобы память не росла.
+        while remaining and len(window) < max(1, concurrency):
+            number = remaining.popleft()
+            task = asyncio.create_task(
+                fetch_listing_page_async(
+                    client, build_page_url(start_url, number), number, bucket
+                )
+            )
+            window.append((number, task))
+
+    try:
+        refill()
+        # Страницы качаются параллельно, но отдаются строго по порядку,
+        # чтобы CSV совпадал с синхронным режимом.
+        while window:
+            page_number, task = window.popleft()
+            status, parsed_page = await task
+            refill()
+            if status == "stop":
+                break
+            if status == "skip" or not parsed_page:
+                continue
+            if not parsed_page["products"]:
+                break
+            yield page_number, parsed_page["products"]
+    finally:
+        for _, task in window:
+            task.cancel()
+        await asyncio.gather(*(task for _, task in window), return_exceptions=True)
+
+
+async def fill_missing_manufacturers_async(
+    client: httpx.AsyncClient,
+    products: List[Dict[str, str]],
+    base_url: str,
+    bucket: TokenBucket,
+    concurrency: int,
+    manufacturer_cache: Optional[ManufacturerCache] = None,
+) -> None:
+    import httpx
+
+    if not products:
+        return
+
+    parts = urlsplit(base_url)
+    base = f"{parts.scheme}://{parts.netloc}"
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    lookups: Dict[str, "asyncio.Task[str]"] = {}
+
+    async def lookup(absolute_url: str, product_url: str) -> str:
+        async with semaphore:
+            try:
+                resp = await fetch_async(client, absolute_url, bucket)
+                resp.raise_for_status()
+            except httpx.HTTPError as error:
+                print(f"Не удалось получить производителя для {product_url}: {error}")
+                return ""
+        manufacturer = extract_manufacturer_from_product_page(resp.text)
+        if manufacturer_cache is not None and manufacturer is not None:
+            manufacturer_cache.put(absolute_url, manufacturer)
+        return manufacturer or ""
+
+    pending: List[Tuple[Dict[str, str], "asyncio.Task[str]"]] = []
+    for item in products:
+        if item.get("manufacturer"):
+            continue
+        product_url = item.get("url")
+        if not product_url:
+            continue
+        absolute_url = urljoin(base, product_url)
+        if manufacturer_cache is not None and absolute_url not in lookups:
+            cached = manufacturer_cache.get(absolute_url)
+            if cached is not None:
+                item["manufacturer"] = cached
+                continue
+        if absolute_url not in lookups:
+            lookups[absolute_url] = asyncio.create_task(lookup(absolute_url, product_url))
+        pending.append((item, lookups[absolute_url]))
+
+    for item, task in pending:
+        item["manufacturer"] = await task
+
+
+async def crawl_async(
+    urls: List[str],
+    max_pages: Optional[int],
+    checkpoint: CrawlCheckpoint,
+    sink: CsvAppender,
+    concurrency: int,
+    rate: float,
+    manufacturer_cache: Optional[ManufacturerCache] = None,
+) -> None:
+    import httpx
+
+    from bot.services.throttle import TokenBucket
+
+    bucket = TokenBucket(rate, burst=concurrency)
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+
+    async with httpx.AsyncClient(
+        headers=DEFAULT_HEADERS,
+        follow_redirects=True,
+        timeout=30.0,
+        limits=limits,
+    ) as client:
+        if checkpoint.pending:
+            pending = checkpoint.pending
+            await fill_missing_manufacturers_async(
+                client,
+                pending["items"],
+                pending["url"],
+                bucket,
+                concurrency,
+                manufacturer_cache,
             )
+            store_page(checkpoint, sink, pending["url"], pending["page"], pending["items"])
+
+        for url in urls:
+            if checkpoint.is_url_done(url):
+                continue
+            parts = urlsplit(url)
+            base_root = f"{parts.scheme}://{parts.netloc}"
+            try:
+                async for page_number, raw_products in iter_listing_pages_async(
+                    client, url, checkpoint, bucket, concurrency, max_pages=max_pages
+                ):
+                    items = checkpoint.take_new(normalize_page(raw_products, base_root))
+                    checkpoint.begin_page(url, page_number, items)
+                    await fill_missing_manufacturers_async(
+                        client, items, url, bucket, concurrency, manufacturer_cache
+                    )
+                    store_page(checkpoint, sink, url, page_number, items)
+            except httpx.HTTPError as error:
+                print(f"Не удалось собрать товары для {url}: {error}")
+                continue
+            except ValueError as error:
+                print(f"Ошибка при обработке {url}: {error}")
+                continue
+            checkpoint.finish_url(url)
+
+
+def csv_row(idx: int, row: Dict[str, str]) -> List:
+    return [
+        idx,
+        row.get("url", ""),
+        row.get("name", ""),
+        row.get("bought", ""),
+        row.get("price", ""),
+        row.get("presence", ""),
+        row.get("manufacturer", ""),
+    ]
+
+
+def write_csv(rows: Iterable[Dict[str, str]], path: Path) -> None:
+    sink = CsvAppender(path)
+    try:
+        sink.write(rows)
+    finally:
+        sink.close()
 
 
 def read_start_urls(path: Optional[Path]) -> List[str]:
@@ -447,7 +1047,60 @@ def main() -> None:
         default=DEFAULT_MAX_PAGES,
         help="Максимум страниц для обхода (по умолчанию 0 — без ограничения). Укажите положительное число, чтобы ограничить.",
     )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Асинхронный режим: параллельная загрузка страниц и карточек товаров",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_ASYNC_CONCURRENCY,
+        help="Число одновременных запросов в асинхронном режиме",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_ASYNC_RATE,
+        help="Максимум запросов в секунду к Prom.ua в асинхронном режиме",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        help=f"Файл контрольной точки (по умолчанию <output>{CHECKPOINT_SUFFIX})",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Продолжить прерванный обход с контрольной точки, дописывая CSV",
+    )
+    parser.add_argument(
+        "--manufacturer-cache",
+        type=Path,
+        default=Path(DEFAULT_MANUFACTURER_CACHE),
+        help="SQLite-файл постоянного кэша производителей (общий для всех запусков)",
+    )
+    parser.add_argument(
+        "--no-manufacturer-cache",
+        action="store_true",
+        help="Не сохранять производителей между запусками",
+    )
+    parser.add_argument(
+        "--manufacturer-ttl",
+        type=float,
+        default=DEFAULT_MANUFACTURER_TTL / (24 * 3600),
+        help="Сколько дней хранить найденного производителя",
+    )
+    parser.add_argument(
+        "--manufacturer-negative-ttl",
+        type=float,
+        default=DEFAULT_MANUFACTURER_NEGATIVE_TTL / (24 * 3600),
+        help="Сколько дней помнить, что у товара нет производителя",
+    )
     args = parser.parse_args()
+    if args.rate <= 0:
+        parser.error("--rate должен быть положительным")
 
     urls = normalize_start_urls(args.urls or [])
     urls.extend(read_start_urls(args.urls_file))
@@ -458,43 +1111,51 @@ def main() -> None:
         print("Не заданы стартовые URL. Передайте их через --url или --urls-file.")
         return
 
-    session = requests.Session()
-    session.headers.update(
-        {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-            "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "ru,uk;q=0.8,en;q=0.6",
-        }
-    )
-
-    all_products: List[Dict[str, str]] = []
-    global_seen = set()
-
     max_pages = args.max_pages if args.max_pages and args.max_pages > 0 else None
 
-    for url in urls:
-        try:
-            products = gather_all_products(session, url, max_pages=max_pages)
-        except requests.RequestException as error:
-            print(f"Не удалось собрать товары для {url}: {error}")
-            continue
-        except ValueError as error:
-            print(f"Ошибка при обработке {url}: {error}")
-            continue
-
-        fill_missing_manufacturers(session, products, url)
-
-        for item in products:
-            product_url = item.get("url", "")
-            if product_url and product_url in global_seen:
-                continue
-            if product_url:
-                global_seen.add(product_url)
-            all_products.append(item)
+    output_path = Path(args.output)
+    checkpoint_path = args.checkpoint or output_path.with_name(
+        output_path.name + CHECKPOINT_SUFFIX
+    )
+    if args.resume and checkpoint_path.exists():
+        checkpoint = CrawlCheckpoint.load(checkpoint_path)
+        print(
+            f"Продолжаем обход с контрольной точки {checkpoint_path}: "
+            f"уже записано {checkpoint.rows_written} товаров"
+        )
+    else:
+        if args.resume:
+            print(f"Контрольная точка {checkpoint_path} не найдена, начинаем заново")
+        checkpoint = CrawlCheckpoint(checkpoint_path)
+    sink = CsvAppender(output_path, keep_rows=checkpoint.rows_written)
+    manufacturer_cache = ManufacturerCache(
+        None if args.no_manufacturer_cache else args.manufacturer_cache,
+        ttl=args.manufacturer_ttl * 24 * 3600,
+        negative_ttl=args.manufacturer_negative_ttl * 24 * 3600,
+    )
 
-    write_csv(all_products, Path(args.output))
-    print(f"Сохранено {len(all_products)} товаров в {args.output}")
+    try:
+        if args.use_async:
+            asyncio.run(
+                crawl_async(
+                    urls,
+                    max_pages,
+                    checkpoint,
+                    sink,
+                    max(1, args.concurrency),
+                    args.rate,
+                    manufacturer_cache,
+                )
+            )
+        else:
+            crawl_sync(urls, max_pages, checkpoint, sink, manufacturer_cache)
+    finally:
+        sink.close()
+        checkpoint.close()
+        manufacturer_cache.close()
+
+    checkpoint.remove()
+    print(f"Сохранено {sink.rows_written} товаров в {args.output}")
 
 
 if __name__ == "__main__":